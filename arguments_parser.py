@@ -1,13 +1,25 @@
 #!/usr/bin/python
 import argparse
+import json
 import os
 import shlex
+from parser.models import Detail
 
 
+# Arguments are parsed by one argument parser, which is built once. Manifest files could be
+# JSON array or JSON Lines of records, see _parse_record
 class ArgumentsParser:
+    manifest_extensions = [".json", ".jsonl"]
+
+    _args_parser = None
+    _record_actions = None
+    # the same clang arguments usually repeat on every line of argument list file
+    _split_clang_arguments = {}
+
     @staticmethod
     def _build_args_parser():
         default_relationship_labeldistance_value = 2
+        default_cache_max_size_value = 512
         uml_class_diagram_relationships = ["association", "dependency",
                                            "aggregation", "composition",
                                            "inheritance", "realization"]
@@ -15,7 +27,9 @@ class ArgumentsParser:
         result = argparse.ArgumentParser(
             description='Builds uml class diagram from header file and/or relationship between '
                         'classes which are represented in graphviz dot language. '
-                        'Elther FILE_PATH or RELATIONSHIP_TYPE or ARGUMENT_LIST_FILE is required. '
+                        'Elther FILE_PATH or BULK_PATH or RELATIONSHIP_TYPE or ARGUMENT_LIST_FILE '
+                        'or CLASS_PATTERN with SYMBOL_INDEX or SYMBOL_INDEX_ROOT or SERVER_SOCKET '
+                        'is required. '
                         'C++ files parsing is based on clang library\n\n'
                         'Note[0]: Classes are matched by fullname, which consist of class '
                         'declaration and namespace before class name')
@@ -24,12 +38,141 @@ class ArgumentsParser:
                             help='Path to file which contains class definition.')
         result.add_argument('-c', '--class-pattern', type=str,
                             help='Pattern of class to extract. See Note[0]. '
-                                 'By default basename of FILE_PATH would be set')
+                                 'By default basename of FILE_PATH would be set. If FILE_PATH '
+                                 'is not set, class is searched in files of SYMBOL_INDEX')
+        result.add_argument('-b', '--bulk-path', type=str,
+                            help='Path to file, directory or glob pattern of files. All classes '
+                                 'defined in those files are extracted. Directories are searched '
+                                 'recursively for headers.')
+        result.add_argument('-ip', '--include-pattern', type=str,
+                            help='Pattern of classes full names extracted from BULK_PATH. '
+                                 'See Note[0]. By default all classes are extracted')
+        result.add_argument('-ep', '--exclude-pattern', type=str,
+                            help='Pattern of classes full names which are not extracted from '
+                                 'BULK_PATH. See Note[0].')
         result.add_argument('-alf', '--argument-list-file', type=str,
-                            help='Path to file where every line is argument to this executable.')
+                            help='Path to file where every line is argument to this executable. '
+                                 'Files with .json or .jsonl extension are JSON array or JSON '
+                                 'Lines of objects whose keys are long options names and values '
+                                 'are their values, for example {"file-path": "a.h", '
+                                 '"clang-arguments": ["-xc++"]}. Object {"defaults": {...}} sets '
+                                 'values of options for objects following it.')
         result.add_argument('-a', '--clang-arguments', type=str,
                             help='Arguments passed to clang before parsing')
 
+        result.add_argument('-cc', '--compile-commands', type=str,
+                            help='Path to compile_commands.json or directory which contains it. '
+                                 'Files are parsed with their compile flags followed by '
+                                 'CLANG_ARGUMENTS. Header files use flags of source file with the '
+                                 'same name in the same directory, of any source file in the '
+                                 'same directory or of source file with the same name. '
+                                 'Language standard from compile flags has priority.')
+
+        result.add_argument('-si', '--symbol-index', type=str,
+                            help='Path to file of index of classes defined in headers. Lines '
+                                 'with CLASS_PATTERN but without FILE_PATH and RELATIONSHIP_TYPE '
+                                 'extract classes from files found by this index.')
+        result.add_argument('-sir', '--symbol-index-root', type=str,
+                            help='Path to file, directory or glob pattern of headers which are '
+                                 'scanned into SYMBOL_INDEX before classes are extracted. Only '
+                                 'changed files are scanned. Index is only updated if nothing '
+                                 'else is set.')
+
+        result.add_argument('-cd', '--cache-dir', type=str,
+                            help='Path to directory where parsed classes are cached between runs. '
+                                 'Directory could be shared between several processes')
+        result.add_argument('-cms', '--cache-max-size', type=int,
+                            help='Sets maximum size of CACHE_DIR in megabytes. Least recently used '
+                                 'entries are removed when it is exceeded.',
+                            default=default_cache_max_size_value)
+
+        result.add_argument('-j', '--jobs', type=int, default=1,
+                            help='Number of worker processes which parse files. '
+                                 'Classes of the same file are parsed by the same worker')
+
+        result.add_argument('-o', '--output-file', type=str,
+                            help='Path to file where graph is written. By default graph is printed')
+        result.add_argument('-pt', '--partition', type=str, choices=["namespace", "component"],
+                            help='Splits graph into partitions of classes of the same namespace '
+                                 'or of classes connected by relationships. Every partition is '
+                                 'written to its own file next to OUTPUT_FILE, for example '
+                                 'graph.0.dot, and OUTPUT_FILE gets index graph of partitions and '
+                                 'counts of relationships between them.')
+        result.add_argument('-pcl', '--partition-clusters', action='store_true',
+                            help='Draws partitions as clusters of one graph instead of writing '
+                                 'them to their own files.')
+        result.add_argument('-pr', '--partition-render', type=str,
+                            help='Sets output format, for example svg, which partitions and '
+                                 'index are rendered to by graphviz dot in JOBS processes.')
+        result.add_argument('-w', '--watch', action='store_true',
+                            help='Keeps running and rewrites OUTPUT_FILE every time any parsed '
+                                 'file or file included by it is changed. Only changed files are '
+                                 'reparsed. OUTPUT_FILE should be set, JOBS is ignored')
+        result.add_argument('-wi', '--watch-interval', type=float, default=0.2,
+                            help='Sets period of checking files modification in seconds.')
+
+        result.add_argument('-ss', '--server-socket', type=str,
+                            help='Runs server which listens on Unix socket at this path. Every '
+                                 'line sent to it is JSON object with "arguments" list of this '
+                                 'executable arguments and optional "format": "dot" or '
+                                 '"classes". Every response line is JSON object with "status", '
+                                 '"messages" and "result" graph or classes. Translation units '
+                                 'and classes are kept between requests. CACHE_DIR, '
+                                 'COMPILE_COMMANDS and SYMBOL_INDEX of server are used.')
+        result.add_argument('-smb', '--server-memory-budget', type=int, default=1024,
+                            help='Sets memory in megabytes which translation units kept by '
+                                 'server could use. Least recently used ones are disposed when '
+                                 'it is exceeded.')
+
+        result.add_argument('-ar', '--ast-relationships', action='store_true',
+                            help='Adds relationships between extracted classes which are derived '
+                                 'from their definitions: inheritance or realization from base '
+                                 'classes, composition from value fields and aggregation from '
+                                 'pointer or reference fields. They are not added between classes '
+                                 'which have relationship set by RELATIONSHIP_TYPE.')
+
+        result.add_argument('-s', '--semantic', action='store_true',
+                            help='Takes types and qualifiers of methods and fields from clang '
+                                 'types instead of parsing their declarations source text.')
+        result.add_argument('-cs', '--compare-semantic', action='store_true',
+                            help='Extracts classes both from declarations source text and from '
+                                 'clang types and prints their differences to stderr. Classes '
+                                 'extracted from source text are drawn. Whitespaces in types are '
+                                 'ignored.')
+
+        result.add_argument('-pch', '--precompiled-header', type=str,
+                            help='Path to header including files shared by parsed files, e.g. STL '
+                                 'and Qt headers. It is precompiled once for every set of clang '
+                                 'arguments and included to every parsed file. Precompiled '
+                                 'headers are kept in CACHE_DIR, if it is set, and are rebuilt '
+                                 'when the header or files included by it change. File with '
+                                 '".pch" extension is used as is.')
+        result.add_argument('-ni', '--no-includes', action='store_true',
+                            help='Parses files without their includes. It is much faster, but '
+                                 'types declared in included files are unresolved, so '
+                                 'semantic extraction and relationships derived from them are '
+                                 'incomplete.')
+        result.add_argument('-dl', '--detail-level', type=str, default="full",
+                            choices=["full", "public", "names"],
+                            help='Sets members shown in classes: all of them, only public ones '
+                                 'or only their names. Hidden members source text is not read.')
+        result.add_argument('-mm', '--max-members', type=int,
+                            help='Sets maximum count of shown fields and of shown methods of every '
+                                 'class. Other members are not parsed and are summarized by '
+                                 '"+K more" row.')
+        result.add_argument('-gs', '--graph-size', action='store_true',
+                            help='Prints count of nodes, count of edges and bytes of labels of '
+                                 'every written graph to stderr.')
+
+        result.add_argument('-p', '--profile', type=str, nargs='?', const='-',
+                            help='Writes JSON report with wall and CPU time of every stage, '
+                                 'parse time of every file, counts of file opens, visited '
+                                 'cursors and regex evaluations and peak RSS to PROFILE file or '
+                                 'to stderr if file is not given. Time of stage does not '
+                                 'include time of stages called from it.')
+        result.add_argument('-pc', '--profile-cprofile', type=str,
+                            help='Path to file where cProfile statistics are dumped.')
+
         result.add_argument('-t', '--relationship-type', type=str,
                             choices=uml_class_diagram_relationships,
                             help='Sets type of relationship. '
@@ -56,8 +199,23 @@ class ArgumentsParser:
 
     @staticmethod
     def _check_args_logic_error(args):
-        if not args.file_path and not args.relationship_type and not args.argument_list_file:
-            return "Error: Neither FILE_PATH nor RELATIONSHIP_TYPE nor FILE_LIST is set"
+        if (not args.file_path and not args.bulk_path and not args.relationship_type and
+                not args.argument_list_file and not args.class_pattern and
+                not args.symbol_index_root and not args.server_socket):
+            return ("Error: Neither FILE_PATH nor BULK_PATH nor RELATIONSHIP_TYPE nor FILE_LIST "
+                    "nor CLASS_PATTERN nor SYMBOL_INDEX_ROOT nor SERVER_SOCKET is set")
+        elif args.symbol_index_root and not args.symbol_index:
+            return "Error: SYMBOL_INDEX_ROOT is set, but SYMBOL_INDEX is not"
+        elif args.watch and not args.output_file:
+            return "Error: WATCH is set, but OUTPUT_FILE is not"
+        elif args.watch and args.partition:
+            return "Error: Both WATCH and PARTITION are set"
+        elif args.partition and not args.partition_clusters and not args.output_file:
+            return "Error: PARTITION is set without PARTITION_CLUSTERS, but OUTPUT_FILE is not"
+        elif (args.partition_clusters or args.partition_render) and not args.partition:
+            return "Error: PARTITION_CLUSTERS or PARTITION_RENDER is set, but PARTITION is not"
+        elif args.partition_render and not args.output_file:
+            return "Error: PARTITION_RENDER is set, but OUTPUT_FILE is not"
         elif args.relationship_type and not args.relationship_dependee:
             return "Error: RELATIONSHIP_TYPE is set, but RELATIONSHIP_DEPENDEE is not"
         elif args.relationship_type and not args.file_path and not args.relationship_depender:
@@ -75,30 +233,158 @@ class ArgumentsParser:
 
         if not args.clang_arguments:
             args.clang_arguments = []
+        elif isinstance(args.clang_arguments, list):
+            args.clang_arguments = list(args.clang_arguments)
         else:
-            args.clang_arguments = shlex.split(args.clang_arguments)
+            split_arguments = ArgumentsParser._split_clang_arguments.get(args.clang_arguments)
+            if split_arguments is None:
+                split_arguments = tuple(shlex.split(args.clang_arguments))
+                ArgumentsParser._split_clang_arguments[args.clang_arguments] = split_arguments
+
+            args.clang_arguments = list(split_arguments)
 
-        clang_arg = "-std=c++11"
-        if clang_arg not in args.clang_arguments:
+        if not any(arg.startswith("-std=") for arg in args.clang_arguments):
             args.clang_arguments.append("-std=c++11")
 
         return args
 
+    # Returns extraction of parse_selected_classes
     @staticmethod
-    def parse(args=None):
-        parser = ArgumentsParser._build_args_parser()
-        args = parser.parse_args(args)
+    def get_extraction(args):
+        if args.compare_semantic:
+            return "compare"
+        elif args.semantic:
+            return "semantic"
 
+        return "text"
+
+    # Returns detail of parse_selected_classes, None if all members are parsed
+    @staticmethod
+    def get_detail(args):
+        if args.detail_level == "full" and args.max_members is None:
+            return None
+
+        return Detail(args.detail_level, args.max_members)
+
+    @staticmethod
+    def _get_args_parser():
+        if ArgumentsParser._args_parser is None:
+            ArgumentsParser._args_parser = ArgumentsParser._build_args_parser()
+
+        return ArgumentsParser._args_parser
+
+    @staticmethod
+    def _check_and_update_args(args):
         logic_error = ArgumentsParser._check_args_logic_error(args)
         if logic_error:
             print "Logical error when parsing arguments", logic_error
-            parser.print_help()
+            ArgumentsParser._get_args_parser().print_help()
             return None
 
-        args = ArgumentsParser._update_args_with_defaults(args)
+        return ArgumentsParser._update_args_with_defaults(args)
 
-        return args
+    @staticmethod
+    def parse(args=None):
+        args = ArgumentsParser._get_args_parser().parse_args(args)
+        return ArgumentsParser._check_and_update_args(args)
+
+    # Returns dictionary of option destination to its action
+    @staticmethod
+    def _get_record_actions():
+        if ArgumentsParser._record_actions is None:
+            ArgumentsParser._record_actions = dict(
+                (action.dest, action) for action in ArgumentsParser._get_args_parser()._actions
+                if action.dest != "help")
 
+        return ArgumentsParser._record_actions
+
+    @staticmethod
+    def _convert_record_value(key, action, value):
+        if isinstance(value, unicode):
+            value = value.encode("utf-8")
+
+        if action.nargs == 0:
+            if not isinstance(value, bool):
+                raise ValueError("Option '{}' should be true or false".format(key))
+        elif action.dest == "clang_arguments" and isinstance(value, list):
+            value = [ArgumentsParser._convert_record_value(key, action, item) for item in value]
+        elif value is not None:
+            try:
+                value = action.type(value) if action.type else value
+            except (TypeError, ValueError):
+                raise ValueError("Invalid value of option '{}': {!r}".format(key, value))
+
+            if action.choices and value not in action.choices:
+                raise ValueError("Option '{}' should be one of {}".format(key, action.choices))
+
+        return value
+
+    # Record is JSON object whose keys are long options names without leading dashes, with
+    # dashes or underscores, and whose values are option values. Clang arguments could be list.
+    # Returns copy of values with values of record. Raises ValueError if record is invalid
+    @staticmethod
+    def _parse_record(record, values):
+        if not isinstance(record, dict):
+            raise ValueError("Record is not JSON object")
+
+        actions = ArgumentsParser._get_record_actions()
+        values = dict(values)
+        for key, value in record.iteritems():
+            action = actions.get(key.replace("-", "_"))
+            if action is None:
+                raise ValueError("Unknown option '{}'".format(key))
+
+            values[action.dest] = ArgumentsParser._convert_record_value(key, action, value)
+
+        return values
+
+    # Yields arguments of every record. Record which has only "defaults" record sets values of
+    # options for following records
+    @staticmethod
+    def _parse_records(records):
+        defaults = dict((action.dest, action.default)
+                        for action in ArgumentsParser._get_record_actions().itervalues())
+
+        for n, record in records:
+            if isinstance(record, dict) and record.keys() == ["defaults"]:
+                defaults = ArgumentsParser._parse_record(record["defaults"], defaults)
+                continue
+
+            args = ArgumentsParser._check_and_update_args(argparse.Namespace(
+                **ArgumentsParser._parse_record(record, defaults)))
+            if not args:
+                raise ValueError("Could not parse arguments of record {}".format(n))
+
+            yield args
+
+    # Yields numbered records, JSON Lines are read one by one
+    @staticmethod
+    def _read_manifest_records(f, file_path):
+        if os.path.splitext(file_path)[1] == ".jsonl":
+            for n, line in enumerate(f):
+                if line.strip():
+                    yield n, json.loads(line)
+        else:
+            records = json.load(f)
+            if not isinstance(records, list):
+                raise ValueError("Manifest is not JSON array")
+
+            for n, record in enumerate(records):
+                yield n, record
+
+    # Yields arguments of every record of manifest, see ManifestArguments
+    @staticmethod
+    def _parse_manifest(file_path):
+        with open(file_path) as f:
+            try:
+                for args in ArgumentsParser._parse_records(
+                        ArgumentsParser._read_manifest_records(f, file_path)):
+                    yield args
+            except ValueError as error:
+                raise ValueError("Error: Could not parse manifest '{}': {}".format(file_path,
+                                                                                  error))
+
+    # Returns list of arguments of every line of file or ManifestArguments of manifest file
     @staticmethod
     def parse_arguments_file(file_path):
         if not file_path:
@@ -109,17 +395,29 @@ class ArgumentsParser:
             print "Error: No such file: '{}'".format(file_path)
             return None
 
-        with open(file_path) as f:
-            lines = f.readlines()
+        if os.path.splitext(file_path)[1] in ArgumentsParser.manifest_extensions:
+            return ManifestArguments(file_path)
 
-        for n, line in enumerate(lines):
-            line_args = shlex.split(line)
-            line_args = ArgumentsParser.parse(line_args)
-            if not line_args:
-                print "Error: Could not parse arguments from file '{}' line {}:'{}'".format(
-                    file_path, n, line)
-                return None
+        with open(file_path) as f:
+            for n, line in enumerate(f):
+                line_args = shlex.split(line)
+                line_args = ArgumentsParser.parse(line_args)
+                if not line_args:
+                    print "Error: Could not parse arguments from file '{}' line {}:'{}'".format(
+                        file_path, n, line)
+                    return None
 
-            result.append(line_args)
+                result.append(line_args)
 
         return result
+
+
+# Arguments of every record of manifest file. Records are streamed from file every time
+# arguments are iterated, so they are not kept in memory. ValueError is raised while iterating
+# if any record is invalid
+class ManifestArguments:
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def __iter__(self):
+        return ArgumentsParser._parse_manifest(self.file_path)
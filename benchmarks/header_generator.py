@@ -0,0 +1,210 @@
+#!/usr/bin/python
+import argparse
+import os
+import random
+
+_common_header_name = "common.h"
+
+_common_header = """#pragma once
+template <typename T>
+struct Box { T value; };
+
+template <typename K, typename V>
+struct Table { K key; V value; };
+"""
+
+_simple_types = ["int", "double", "bool", "char", "unsigned long", "const char*"]
+
+
+def add_generator_arguments(parser):
+    parser.add_argument('-gf', '--files', type=int, default=4,
+                        help='Number of generated headers.')
+    parser.add_argument('-gc', '--classes', type=int, default=25,
+                        help='Number of classes in every header.')
+    parser.add_argument('-gm', '--methods', type=int, default=10,
+                        help='Number of methods in every class.')
+    parser.add_argument('-gfl', '--fields', type=int, default=5,
+                        help='Number of fields in every class.')
+    parser.add_argument('-gn', '--namespace-depth', type=int, default=2,
+                        help='Number of nested namespaces around classes.')
+    parser.add_argument('-gt', '--template-depth', type=int, default=2,
+                        help='Maximum nesting of template arguments in member types.')
+    parser.add_argument('-gs', '--seed', type=int, default=0,
+                        help='Seed of random generator, the same seed gives the same headers.')
+
+
+# Returns dictionary of generator parameters from parsed arguments
+def get_generator_parameters(args):
+    return {"files": args.files,
+            "classes": args.classes,
+            "methods": args.methods,
+            "fields": args.fields,
+            "namespace_depth": args.namespace_depth,
+            "template_depth": args.template_depth,
+            "seed": args.seed}
+
+
+def _build_class_name(file_index, class_index):
+    return "Class_{}_{}".format(file_index, class_index)
+
+
+def _build_type(random_generator, depth):
+    if depth <= 0:
+        return random_generator.choice(_simple_types)
+
+    nested_type = _build_type(random_generator, random_generator.randint(0, depth - 1))
+    if random_generator.random() < 0.5:
+        return "Box<{}>".format(nested_type)
+
+    return "Table<{}, {}>".format(random_generator.choice(_simple_types), nested_type)
+
+
+def _build_parameters(random_generator, template_depth, template_type=None):
+    results = []
+    for n in range(random_generator.randint(0, 3)):
+        type = _build_type(random_generator, random_generator.randint(0, template_depth))
+        if template_type and n == 0:
+            result = "const {}& arg{}".format(template_type, n)
+        elif type in ["int", "double", "bool"] and random_generator.random() < 0.3:
+            result = "{} arg{} = 0".format(type, n)
+        elif random_generator.random() < 0.3:
+            result = "const {}& arg{}".format(type, n)
+        else:
+            result = "{} arg{}".format(type, n)
+
+        results.append(result)
+
+    return ", ".join(results)
+
+
+def _build_method(random_generator, index, template_depth):
+    kind = random_generator.choice(["plain", "const", "virtual", "static", "template"])
+    return_type = _build_type(random_generator, random_generator.randint(0, template_depth))
+    name = "method{}".format(index)
+
+    if kind == "template":
+        parameters = _build_parameters(random_generator, template_depth, "T")
+        return "template <typename T> {} {}({});".format(return_type, name, parameters)
+
+    parameters = _build_parameters(random_generator, template_depth)
+    if kind == "const":
+        return "{} {}({}) const;".format(return_type, name, parameters)
+    elif kind == "virtual":
+        return "virtual {} {}({}) = 0;".format(return_type, name, parameters)
+    elif kind == "static":
+        return "static {} {}({});".format(return_type, name, parameters)
+
+    return "{} {}({});".format(return_type, name, parameters)
+
+
+def _build_field(random_generator, index, template_depth):
+    prefix = random_generator.choice(["", "", "", "static ", "mutable "])
+    type = _build_type(random_generator, random_generator.randint(0, template_depth))
+    return "{}{} field{}_;".format(prefix, type, index)
+
+
+def _build_class(random_generator, file_index, class_index, parameters):
+    lines = []
+
+    name = _build_class_name(file_index, class_index)
+    if class_index:
+        lines.append("class {} : public {} {{".format(
+            name, _build_class_name(file_index, class_index - 1)))
+    else:
+        lines.append("class {} {{".format(name))
+
+    lines.append("public:")
+    lines.append("    {}();".format(name))
+    lines.append("    virtual ~{}();".format(name))
+    for n in range(parameters["methods"]):
+        lines.append("    " + _build_method(random_generator, n, parameters["template_depth"]))
+
+    lines.append("private:")
+    for n in range(parameters["fields"]):
+        lines.append("    " + _build_field(random_generator, n, parameters["template_depth"]))
+
+    lines.append("};")
+    return lines
+
+
+def _build_header(random_generator, file_index, parameters):
+    lines = ["#pragma once", '#include "{}"'.format(_common_header_name)]
+
+    namespaces = ["bench_{}".format(file_index)]
+    namespaces += ["level_{}".format(n) for n in range(1, parameters["namespace_depth"])]
+    namespaces = namespaces[:parameters["namespace_depth"]]
+    for namespace in namespaces:
+        lines.append("namespace {} {{".format(namespace))
+
+    for class_index in range(parameters["classes"]):
+        lines.extend(_build_class(random_generator, file_index, class_index, parameters))
+
+    for namespace in reversed(namespaces):
+        lines.append("}} // namespace {}".format(namespace))
+
+    return "\n".join(lines) + "\n"
+
+
+def _build_argument_lines(header_path, file_index, parameters):
+    clang_arguments = '-a="-xc++ -I{}"'.format(os.path.dirname(header_path))
+
+    results = []
+    for class_index in range(parameters["classes"]):
+        results.append("-f {} -c {} {}".format(header_path,
+                                               _build_class_name(file_index, class_index),
+                                               clang_arguments))
+
+    for class_index in range(1, parameters["classes"]):
+        results.append("-t inheritance -dr {}$ -de {}$".format(
+            _build_class_name(file_index, class_index),
+            _build_class_name(file_index, class_index - 1)))
+
+    return results
+
+
+# Writes headers and argument list file which extracts every class and inheritance
+# relationships between them. Returns list of headers paths and argument list file path
+def generate(directory, parameters):
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    directory = os.path.abspath(directory)
+    random_generator = random.Random(parameters["seed"])
+
+    with open(os.path.join(directory, _common_header_name), "w") as f:
+        f.write(_common_header)
+
+    header_paths = []
+    argument_lines = []
+    for file_index in range(parameters["files"]):
+        header_path = os.path.join(directory, "bench_{}.h".format(file_index))
+        with open(header_path, "w") as f:
+            f.write(_build_header(random_generator, file_index, parameters))
+
+        header_paths.append(header_path)
+        argument_lines.extend(_build_argument_lines(header_path, file_index, parameters))
+
+    argument_list_file_path = os.path.join(directory, "arguments.txt")
+    with open(argument_list_file_path, "w") as f:
+        f.write("\n".join(argument_lines) + "\n")
+
+    return header_paths, argument_list_file_path
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Generates synthetic C++ headers and argument list file for benchmarks.')
+    parser.add_argument('-o', '--output-dir', type=str, required=True,
+                        help='Path to directory where headers are written.')
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    header_paths, argument_list_file_path = generate(args.output_dir,
+                                                     get_generator_parameters(args))
+    print "Generated {} headers, argument list file: '{}'".format(len(header_paths),
+                                                                   argument_list_file_path)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
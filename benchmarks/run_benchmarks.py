@@ -0,0 +1,218 @@
+#!/usr/bin/python
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from StringIO import StringIO
+from arguments_parser import ArgumentsParser
+from build_class_diagram_graph import build_class_requests, build_node_dictionaries
+from dot_utils import write_graph
+from parser.class_parser import ClassParser
+from parser.cindex_wrappers.file_declarations_parser import FileDeclarationsParser
+from parser.cindex_wrappers.source_range_wrapper import SourceBuffers, SourceRangeWrapper
+from parser.cindex_wrappers.translation_unit_registry import TranslationUnitRegistry
+from parser.declaration_parsers.function_declaration_parser import FunctionDeclarationParser
+from benchmarks.header_generator import (add_generator_arguments, generate,
+                                         get_generator_parameters)
+
+stages = ["clang_parse", "cursor_traversal", "extent_reading", "declaration_parsing",
+          "rendering", "dot_assembly"]
+
+
+def _build_args_parser():
+    result = argparse.ArgumentParser(
+        description='Times every stage of building class diagram: clang parse, cursor '
+                    'traversal, extent reading, declaration parsing, UML/HTML rendering and DOT '
+                    'assembly. By default synthetic headers are generated and benchmarked.')
+    result.add_argument('-alf', '--argument-list-file', type=str,
+                        help='Benchmarks classes of existing argument list file instead of '
+                             'generated ones.')
+    result.add_argument('-ni', '--no-includes', action='store_true',
+                        help='Parses files without their includes, see ArgumentsParser.')
+    result.add_argument('-r', '--repeat', type=int, default=3,
+                        help='Number of runs. The fastest time of every stage is reported.')
+    result.add_argument('-o', '--output-file', type=str,
+                        help='Path to file where JSON results are written. By default they are '
+                             'printed')
+    result.add_argument('-bl', '--baseline', type=str,
+                        help='Path to JSON results of previous run. Exit code is 1 if any stage '
+                             'is slower than in baseline by more than TOLERANCE.')
+    result.add_argument('-tol', '--tolerance', type=float, default=0.2,
+                        help='Allowed relative slowdown of stage compared to baseline.')
+    result.add_argument('-md', '--min-delta', type=float, default=0.005,
+                        help='Slowdowns shorter than MIN_DELTA seconds are not regressions.')
+    add_generator_arguments(result)
+    return result
+
+
+def _measure(timings, stage, function, *args):
+    start = time.time()
+    result = function(*args)
+    timings[stage] = time.time() - start
+    return result
+
+
+def _parse_translation_units(file_parsers, registry):
+    for file_parser in file_parsers:
+        registry.parse(file_parser.file_path, file_parser.clang_args, file_parser.options)
+
+
+# Returns member nodes of all classes defined in files
+def _traverse_cursors(file_parsers):
+    results = []
+    for file_parser in file_parsers:
+        for parsers in file_parser.build_class_index().itervalues():
+            for parser in parsers:
+                results.append(parser.node)
+                results.extend(parser.node.get_children())
+
+    return results
+
+
+def _read_extents(nodes):
+    SourceBuffers.forget()
+    for node in nodes:
+        SourceRangeWrapper(node.extent).read()
+
+
+def _parse_declarations(classes):
+    FunctionDeclarationParser.parsed_declarations.clear()
+    return [ClassParser.extend_class_with_declaration_info(_class) for _class in classes]
+
+
+def _write_graph(args_list, node_dictionaries):
+    stream = StringIO()
+    write_graph(stream, args_list, node_dictionaries)
+    return stream.getvalue()
+
+
+# Every stage is timed separately, results of previous stage are ready before next one starts
+def _run_stages(args_list, skip_includes=False):
+    timings = OrderedDict()
+    registry = TranslationUnitRegistry()
+
+    file_parsers = OrderedDict()
+    for file_path, selector, clang_arguments in build_class_requests(args_list):
+        key = TranslationUnitRegistry.build_key(file_path, clang_arguments)
+        if key not in file_parsers:
+            file_parsers[key] = FileDeclarationsParser(file_path, clang_arguments, registry,
+                                                       skip_includes)
+    file_parsers = file_parsers.values()
+
+    _measure(timings, "clang_parse", _parse_translation_units, file_parsers, registry)
+    nodes = _measure(timings, "cursor_traversal", _traverse_cursors, file_parsers)
+    _measure(timings, "extent_reading", _read_extents, nodes)
+
+    classes = []
+    full_names = set()
+    for file_parser in file_parsers:
+        for _class in file_parser.parse_matching_classes(lambda full_name: True):
+            if _class.full_name not in full_names:
+                full_names.add(_class.full_name)
+                classes.append(_class)
+
+    classes = _measure(timings, "declaration_parsing", _parse_declarations, classes)
+    node_dictionaries = _measure(timings, "rendering", lambda: list(
+        build_node_dictionaries(classes)))
+    _measure(timings, "dot_assembly", _write_graph, args_list, node_dictionaries)
+
+    SourceBuffers.forget()
+    return timings
+
+
+def run(args_list, repeat, skip_includes=False):
+    results = OrderedDict((stage, None) for stage in stages)
+    for n in range(repeat):
+        for stage, seconds in _run_stages(args_list, skip_includes).iteritems():
+            if results[stage] is None or seconds < results[stage]:
+                results[stage] = seconds
+
+    results["total"] = sum(results.values())
+    return results
+
+
+# Returns descriptions of stages which are slower than in baseline
+def find_regressions(results, baseline, tolerance, min_delta):
+    regressions = []
+    for stage, seconds in results["stages"].iteritems():
+        baseline_seconds = baseline["stages"].get(stage)
+        if baseline_seconds is None:
+            continue
+
+        if seconds > baseline_seconds * (1 + tolerance) and seconds - baseline_seconds > min_delta:
+            regressions.append("Stage '{}' regressed: {:.4f}s, baseline {:.4f}s".format(
+                stage, seconds, baseline_seconds))
+
+    return regressions
+
+
+def _load_args_list(argument_list_file):
+    args_list = ArgumentsParser.parse_arguments_file(argument_list_file)
+    if not args_list:
+        print "Error: Could not parse argument list file '{}'".format(argument_list_file)
+
+    return args_list
+
+
+def main():
+    args = _build_args_parser().parse_args()
+
+    results = OrderedDict()
+    if args.argument_list_file:
+        results["configuration"] = {"argument_list_file": args.argument_list_file}
+        args_list = _load_args_list(args.argument_list_file)
+        if not args_list:
+            return 1
+
+        results["stages"] = run(args_list, args.repeat, args.no_includes)
+    else:
+        results["configuration"] = get_generator_parameters(args)
+        directory = tempfile.mkdtemp(prefix="class_diagram_benchmark_")
+        try:
+            argument_list_file = generate(directory, results["configuration"])[1]
+            args_list = _load_args_list(argument_list_file)
+            if not args_list:
+                return 1
+
+            results["stages"] = run(args_list, args.repeat, args.no_includes)
+        finally:
+            shutil.rmtree(directory)
+
+    results["configuration"]["repeat"] = args.repeat
+    results["configuration"]["no_includes"] = args.no_includes
+
+    if args.output_file:
+        with open(args.output_file, "w") as f:
+            json.dump(results, f, indent=4)
+            f.write("\n")
+    else:
+        print json.dumps(results, indent=4)
+
+    if args.baseline:
+        if not os.path.isfile(args.baseline):
+            print "Error: No such file: '{}'".format(args.baseline)
+            return 1
+
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        if baseline.get("configuration") != results["configuration"]:
+            print >> sys.stderr, "Warning: Baseline configuration differs: {}".format(
+                baseline.get("configuration"))
+
+        regressions = find_regressions(results, baseline, args.tolerance, args.min_delta)
+        for regression in regressions:
+            print >> sys.stderr, regression
+
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
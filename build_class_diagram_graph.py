@@ -1,50 +1,297 @@
 #!/usr/bin/python
-from parser.class_parser import ClassParser
+import os
+import signal
+import sys
+from collections import Counter
+from parser.file_classes_parser import FileClassesParser, parse_selected_classes
+from parser.class_cache import ClassCache
+from parser.compilation_database import CompilationDatabase
+from parser.symbol_index import SymbolIndex
+from parser.precompiled_header import PrecompiledHeader
+from parser.cindex_wrappers.translation_unit_registry import TranslationUnitRegistry
+from parser.cindex_wrappers.source_range_wrapper import SourceBuffers
 from arguments_parser import ArgumentsParser
 from html_utils import format_uml_class_features_to_html
-from uml_utils import build_uml_properties_representation, build_uml_methods_representation
-from dot_utils import build_graph
+from dot_utils import print_graph_size, write_graph
+from parallel_utils import parse_classes_in_parallel
+from watch_utils import watch, open_file_atomically
+from server_utils import ClassDiagramService, serve
+from partition_utils import write_partitioned_graph
+from profile_utils import Profiler
 
 
-def parse_classes(args_list):
-    result = []
+def _get_clang_arguments(file_path, args, compilation_database):
+    if compilation_database:
+        result = compilation_database.get_arguments(file_path, args.clang_arguments)
+        if result is not None:
+            return result
+
+    return args.clang_arguments
+
+
+# Class pattern without file path is searched in symbol index, class is extracted from every
+# file where it is found
+def _find_class_files(args, symbol_index):
+    if not symbol_index:
+        print "Error: CLASS_PATTERN '{}' is set without FILE_PATH, but SYMBOL_INDEX is not".format(
+            args.class_pattern)
+        return []
+
+    results = symbol_index.find_class_files(args.class_pattern)
+    if not results:
+        print "Error: No class matching pattern '{}' in symbol index '{}'".format(
+            args.class_pattern, symbol_index.path)
+
+    return results
+
+
+# Returns list of (file_path, selector, clang_arguments), see parse_selected_classes
+def build_class_requests(args_list, compilation_database=None, symbol_index=None):
+    results = []
 
     for args in args_list:
         if args.file_path:
-            c = ClassParser(args.file_path, args.class_pattern, args.clang_arguments).parse()
-            if c:
-                result.append(c)
+            results.append((args.file_path, args.class_pattern,
+                            _get_clang_arguments(args.file_path, args, compilation_database)))
+        elif args.class_pattern and not args.relationship_type:
+            for file_path in _find_class_files(args, symbol_index):
+                results.append((file_path, args.class_pattern,
+                                _get_clang_arguments(file_path, args, compilation_database)))
 
-    return result
+        if args.bulk_path:
+            selector = (args.include_pattern, args.exclude_pattern)
+            for file_path in FileClassesParser.find_files(args.bulk_path):
+                results.append((file_path, selector,
+                                _get_clang_arguments(file_path, args, compilation_database)))
 
+    return results
 
-def build_node_dictionaries(classes):
-    results = []
+
+def _build_request_key(request):
+    file_path, selector, clang_arguments = request
+    return TranslationUnitRegistry.build_key(file_path, clang_arguments), selector
+
+
+# Results of memo and registry which are not given are kept only till their last request
+def _parse_classes_serially(requests, registry, memo, cache, extraction, detail, skip_includes,
+                            with_relationships, precompiled_header):
+    keep_memo = memo is not None
+    keep_registry = registry is not None
+    memo = memo if keep_memo else {}
+    registry = registry if keep_registry else TranslationUnitRegistry(precompiled_header)
+
+    remaining_keys = Counter(_build_request_key(request) for request in requests)
+    remaining_files = Counter(key[0][0] for key in remaining_keys.elements())
+
+    for request in requests:
+        file_path, selector, clang_arguments = request
+        key = _build_request_key(request)
+        if key not in memo:
+            memo[key] = parse_selected_classes(file_path, selector, clang_arguments, registry,
+                                               cache, extraction, detail, skip_includes,
+                                               with_relationships)
+
+        # memo could be LruDictionary, whose items are used by get()
+        result = memo.get(key)
+
+        remaining_keys[key] -= 1
+        if not keep_memo and not remaining_keys[key]:
+            del memo[key]
+
+        remaining_files[key[0][0]] -= 1
+        if not keep_registry and not remaining_files[key[0][0]]:
+            registry.forget_file(key[0][0])
+            SourceBuffers.forget(key[0][0])
+
+        yield result
+
+
+# Yields parsed classes one by one.
+# Every file is parsed once per registry and every class is parsed once per memo.
+# With several jobs files are parsed in worker processes, result order is kept the same.
+# See parse_selected_classes for extraction, detail, skip_includes and with_relationships values.
+# Registries which are not given use precompiled header, see PrecompiledHeader.
+def parse_classes(args_list, registry=None, memo=None, cache=None, jobs=1,
+                  compilation_database=None, extraction="text", symbol_index=None,
+                  detail=None, skip_includes=False, precompiled_header=None,
+                  with_relationships=False):
+    full_names = set()
+
+    requests = build_class_requests(args_list, compilation_database, symbol_index)
+    if jobs > 1:
+        parsed_classes = parse_classes_in_parallel(requests, jobs, cache, extraction, detail,
+                                                   skip_includes, with_relationships,
+                                                   precompiled_header)
+    else:
+        parsed_classes = _parse_classes_serially(requests, registry, memo, cache, extraction,
+                                                 detail, skip_includes, with_relationships,
+                                                 precompiled_header)
+
+    for classes in parsed_classes:
+        for c in classes:
+            if c.full_name not in full_names:
+                full_names.add(c.full_name)
+                yield c
+
+    if cache:
+        cache.evict()
+
+
+# Relationships derived from classes definitions are added if with_relationships is set
+def build_node_dictionaries(classes, with_relationships=False):
     for _class in classes:
-        full_name = _class["full_name"]
-        properties_uml = build_uml_properties_representation(_class["fields"])
-        methods_uml = build_uml_methods_representation(_class["methods"])
-        label = format_uml_class_features_to_html(full_name, properties_uml, methods_uml)
-        results.append({"name": full_name, "label": label})
+        full_name = _class.full_name
+        label = format_uml_class_features_to_html(full_name, _class.fields, _class.methods,
+                                                  _class.hidden_fields_count,
+                                                  _class.hidden_methods_count)
+        result = {"name": full_name, "label": label, "namespace": _class.namespace}
+        if with_relationships:
+            result["relationships"] = _class.relationships
 
-    return results
+        yield result
 
 
-def main():
-    args = ArgumentsParser.parse()
-    if not args:
-        print "Error: Argument parser error"
-        return 1
+# Returns size of graph, see write_graph
+def write_class_diagram(stream, args_list, registry=None, memo=None, cache=None, jobs=1,
+                        compilation_database=None, ast_relationships=False, extraction="text",
+                        symbol_index=None, detail=None, skip_includes=False,
+                        precompiled_header=None):
+    classes = parse_classes(args_list, registry, memo, cache, jobs, compilation_database,
+                            extraction, symbol_index, detail, skip_includes, precompiled_header,
+                            ast_relationships)
+    node_dictionaries = build_node_dictionaries(classes, ast_relationships)
+    return write_graph(stream, args_list, node_dictionaries)
+
+
+# Returns True if nothing but symbol index update is requested
+def _is_index_only_run(args):
+    return not (args.file_path or args.bulk_path or args.relationship_type or
+                args.argument_list_file or args.class_pattern or args.server_socket)
+
+
+def _run(args):
+    symbol_index = None
+    if args.symbol_index:
+        symbol_index = SymbolIndex(args.symbol_index)
+        if args.symbol_index_root:
+            scanned_files_count = symbol_index.update(args.symbol_index_root)
+            if scanned_files_count:
+                symbol_index.save()
+
+            if _is_index_only_run(args):
+                print "Symbol index '{}': {} files, {} scanned".format(
+                    args.symbol_index, len(symbol_index.files), scanned_files_count)
+                return 0
 
     args_list = ArgumentsParser.parse_arguments_file(args.argument_list_file)
     if not args_list:
         args_list = [args]
 
+    cache = None
+    if args.cache_dir:
+        cache = ClassCache(args.cache_dir, args.cache_max_size * 1024 * 1024)
+
+    compilation_database = None
+    if args.compile_commands:
+        if not os.path.exists(args.compile_commands):
+            print "Error: No such file: '{}'".format(args.compile_commands)
+            return 1
+
+        compilation_database = CompilationDatabase(args.compile_commands)
+
+    precompiled_header = None
+    if args.precompiled_header:
+        if not os.path.exists(args.precompiled_header):
+            print "Error: No such file: '{}'".format(args.precompiled_header)
+            return 1
+
+        precompiled_header = PrecompiledHeader(
+            args.precompiled_header,
+            os.path.join(args.cache_dir, "precompiled_headers") if args.cache_dir else None)
+
     try:
-        classes = parse_classes(args_list)
-        node_dictionaries = build_node_dictionaries(classes)
-        graph = build_graph(args_list, node_dictionaries)
-        print graph
+        return _build_diagrams(args, args_list, cache, compilation_database, symbol_index,
+                               precompiled_header)
+    finally:
+        if precompiled_header:
+            precompiled_header.remove_temporary_directory()
+
+
+# Serves, watches or writes diagram once, returns exit code
+def _build_diagrams(args, args_list, cache, compilation_database, symbol_index,
+                    precompiled_header):
+    extraction = ArgumentsParser.get_extraction(args)
+    detail = ArgumentsParser.get_detail(args)
+
+    if args.server_socket:
+        def parse(request_args, request_args_list, registry, memo):
+            return list(parse_classes(request_args_list, registry, memo, cache,
+                                      compilation_database=compilation_database,
+                                      extraction=ArgumentsParser.get_extraction(request_args),
+                                      symbol_index=symbol_index,
+                                      detail=ArgumentsParser.get_detail(request_args),
+                                      skip_includes=request_args.no_includes,
+                                      with_relationships=request_args.ast_relationships))
+
+        def render(stream, request_args, request_args_list, classes):
+            node_dictionaries = build_node_dictionaries(classes, request_args.ast_relationships)
+            write_graph(stream, request_args_list, node_dictionaries)
+
+        service = ClassDiagramService(parse, render, cache,
+                                      args.server_memory_budget * 1024 * 1024,
+                                      precompiled_header)
+        try:
+            return serve(args.server_socket, service)
+        except KeyboardInterrupt:
+            return 0
+
+    if args.watch:
+        def build(stream, registry, memo):
+            write_class_diagram(stream, args_list, registry, memo, cache,
+                                compilation_database=compilation_database,
+                                ast_relationships=args.ast_relationships,
+                                extraction=extraction, symbol_index=symbol_index,
+                                detail=detail, skip_includes=args.no_includes)
+
+        try:
+            watch(build, args.output_file, TranslationUnitRegistry(precompiled_header), {},
+                  cache, args.watch_interval)
+        except KeyboardInterrupt:
+            return 0
+
+    try:
+        if args.partition:
+            classes = parse_classes(args_list, cache=cache, jobs=args.jobs,
+                                    compilation_database=compilation_database,
+                                    extraction=extraction, symbol_index=symbol_index,
+                                    detail=detail, skip_includes=args.no_includes,
+                                    precompiled_header=precompiled_header,
+                                    with_relationships=args.ast_relationships)
+            node_dictionaries = list(build_node_dictionaries(classes, args.ast_relationships))
+            return write_partitioned_graph(args.output_file, args_list, node_dictionaries,
+                                           args.partition, args.partition_clusters,
+                                           args.partition_render, args.jobs, args.graph_size)
+        elif args.output_file:
+            with open_file_atomically(args.output_file) as stream:
+                size = write_class_diagram(stream, args_list, cache=cache, jobs=args.jobs,
+                                           compilation_database=compilation_database,
+                                           ast_relationships=args.ast_relationships,
+                                           extraction=extraction, symbol_index=symbol_index,
+                                           detail=detail, skip_includes=args.no_includes,
+                                           precompiled_header=precompiled_header)
+                stream.write("\n")
+        else:
+            size = write_class_diagram(sys.stdout, args_list, cache=cache, jobs=args.jobs,
+                                       compilation_database=compilation_database,
+                                       ast_relationships=args.ast_relationships,
+                                       extraction=extraction, symbol_index=symbol_index,
+                                       detail=detail, skip_includes=args.no_includes,
+                                       precompiled_header=precompiled_header)
+            print
+
+        if args.graph_size:
+            print_graph_size(args.output_file, size)
+
         return 0
     except ValueError as error:
         print(error)
@@ -52,5 +299,33 @@ def main():
     return 1
 
 
+# Cleanup of finally blocks and atexit handlers is done when process is stopped by SIGTERM too
+def _exit_on_signal(signal_number, frame):
+    sys.exit(128 + signal_number)
+
+
+def main():
+    signal.signal(signal.SIGTERM, _exit_on_signal)
+    args = ArgumentsParser.parse()
+    if not args:
+        print "Error: Argument parser error"
+        return 1
+
+    if not args.profile and not args.profile_cprofile:
+        return _run(args)
+
+    if args.jobs > 1:
+        print >> sys.stderr, "Warning: Worker processes are not profiled"
+
+    profiler = Profiler(args.profile_cprofile)
+    profiler.start(sys.modules[__name__])
+    try:
+        return _run(args)
+    finally:
+        profiler.stop()
+        if args.profile:
+            profiler.write_report(args.profile)
+
+
 if __name__ == "__main__":
     exit(main())
@@ -1,5 +1,8 @@
 #!/usr/bin/python
-import re
+import sys
+from collections import OrderedDict
+from StringIO import StringIO
+from parser.name_resolver import NameResolver
 
 
 # NODES
@@ -8,12 +11,8 @@ import re
 def build_dot_nodes(node_dictionaries):
     template = "\"{}\" [\n\tlabel = \n{}];"
 
-    results = []
     for dictionary in node_dictionaries:
-        result = template.format(dictionary["name"], dictionary["label"])
-        results.append(result)
-
-    return results
+        yield template.format(dictionary["name"], dictionary["label"])
 
 
 # RELATIONSHIPS
@@ -56,11 +55,11 @@ def _build_relationship(depender, dependee, rtype,
     return "\"{}\" -> \"{}\" {}".format(depender, dependee, edge_attributes)
 
 
-def _match_the_only_name(node_names, pattern):
-    results = [name for name in node_names if re.search(pattern, name)]
+def _match_the_only_name(resolver, pattern):
+    results = resolver.match(pattern)
 
     if not results:
-        print "Error: No class full name matching pattern '{}': {}".format(pattern, node_names)
+        print "Error: No class full name matching pattern '{}': {}".format(pattern, resolver.names)
         return None
 
     elif len(results) > 1:
@@ -71,50 +70,183 @@ def _match_the_only_name(node_names, pattern):
     return results[0]
 
 
+# Returns list of (depender full name, dependee full name, args) or None
+def _resolve_relationships(args_list, node_names):
+    results = []
+
+    relationships_args = [args for args in args_list if args.relationship_type]
+    for args in relationships_args:
+        if not args.relationship_depender:
+            args.relationship_depender = args.class_pattern
+
+    resolver = NameResolver(node_names)
+    resolver.match_all([pattern for args in relationships_args
+                        for pattern in [args.relationship_depender, args.relationship_dependee]])
+
+    for args in relationships_args:
+        depender_full_name = _match_the_only_name(resolver, args.relationship_depender)
+        dependee_full_name = _match_the_only_name(resolver, args.relationship_dependee)
+        if depender_full_name is None or dependee_full_name is None:
+            print "Could not build relationships with args '{}'.".format(args)
+            return None
+
+        results.append((depender_full_name, dependee_full_name, args))
+
+    return results
+
+
+def _build_args_relationship(depender_full_name, dependee_full_name, args):
+    return _build_relationship(depender_full_name,
+                               dependee_full_name,
+                               args.relationship_type,
+                               args.relationship_taillabel,
+                               args.relationship_label,
+                               args.relationship_headlabel,
+                               args.relationship_labeldistance)
+
+
 def build_relationships(args_list, node_names):
+    resolved_relationships = _resolve_relationships(args_list, node_names)
+    if resolved_relationships is None:
+        return None
+
+    return [_build_args_relationship(*relationship) for relationship in resolved_relationships]
+
+
+# node_relationships is list of (depender, dependee, type). Returns list of (depender, dependee,
+# relationship). Relationships to classes which aren't nodes and between pairs of classes from
+# skipped_pairs are not built
+def _build_node_edges(node_relationships, node_names, skipped_pairs=None):
     results = []
 
-    for args in args_list:
-        if args.relationship_type:
-            if not args.relationship_depender:
-                args.relationship_depender = args.class_pattern
-
-            depender_full_name = _match_the_only_name(node_names, args.relationship_depender)
-            dependee_full_name = _match_the_only_name(node_names, args.relationship_dependee)
-            if depender_full_name is None or dependee_full_name is None:
-                print "Could not build relationships with args '{}'.".format(args)
-                return None
-
-            relationship = _build_relationship(depender_full_name,
-                                               dependee_full_name,
-                                               args.relationship_type,
-                                               args.relationship_taillabel,
-                                               args.relationship_label,
-                                               args.relationship_headlabel,
-                                               args.relationship_labeldistance)
-            results.append(relationship)
+    node_names = set(node_names)
+    skipped_pairs = set(skipped_pairs or [])
+    built_relationships = set()
+    for relationship in node_relationships:
+        if (relationship[1] in node_names and relationship[:2] not in skipped_pairs and
+                relationship not in built_relationships):
+            built_relationships.add(relationship)
+            results.append((relationship[0], relationship[1], _build_relationship(*relationship)))
+
+    return results
+
+
+# See _build_node_edges
+def build_node_relationships(node_relationships, node_names, skipped_pairs=None):
+    return [edge[2] for edge in _build_node_edges(node_relationships, node_names, skipped_pairs)]
+
+
+# Returns relationships of node dictionary as list of (depender, dependee, type)
+def get_node_relationships(dictionary):
+    return [(dictionary["name"], relationship.dependee, relationship.type)
+            for relationship in dictionary.get("relationships", [])]
+
+
+# Returns list of (depender, dependee, relationship) of relationships set by args_list and
+# derived from node relationships, see write_graph
+def build_edges(args_list, node_names, node_relationships):
+    resolved_relationships = _resolve_relationships(args_list, node_names)
+    if resolved_relationships is None:
+        raise ValueError("Error: Could not build relationships")
+
+    results = [(depender, dependee, _build_args_relationship(depender, dependee, args))
+               for depender, dependee, args in resolved_relationships]
+    results.extend(_build_node_edges(
+        node_relationships, node_names,
+        [(depender, dependee) for depender, dependee, _ in resolved_relationships]))
 
     return results
 
 # GRAPH
 
 
+_graph_header = ('digraph "Class Diagram"\n'
+                 '{\n'
+                 '\tbgcolor = transparent;\n'
+                 '\trankdir = LR;\n'
+                 '\tedge [fontname = Helvetica, fontsize = 10, labelfontname = Helvetica, '
+                 'labelfontsize = 10];\n'
+                 '\tnode [fontname = Helvetica, fontsize = 10, shape = none, margin = 0, '
+                 'style = filled, fillcolor = grey75, fontcolor = black ];\n'
+                 '\n')
+
+_graph_footer = '\n}'
+
+
+def _write_joined(stream, strings, separator):
+    for n, string in enumerate(strings):
+        if n:
+            stream.write(separator)
+
+        stream.write(string)
+
+
+def _build_graph_size(nodes_count, edges_count, label_bytes):
+    return OrderedDict([("nodes", nodes_count), ("edges", edges_count),
+                        ("label_bytes", label_bytes)])
+
+
+# Prints size of graph written to file or printed if file path is not set
+def print_graph_size(file_path, size):
+    print >> sys.stderr, "Graph size of '{}': {} nodes, {} edges, {} label bytes".format(
+        file_path or "<stdout>", size["nodes"], size["edges"], size["label_bytes"])
+
+
+# Writes graph to stream node by node, only node names and relationships are kept in memory.
+# node_dictionaries could also contain 'relationships' key with list of dictionaries with
+# 'type' and 'dependee' keys. Returns size of graph: counts of nodes and edges and bytes of labels
+def write_graph(stream, args_list, node_dictionaries):
+    node_names = []
+    node_relationships = []
+    label_bytes = [0]
+
+    def remember_node(dictionaries):
+        for dictionary in dictionaries:
+            node_names.append(dictionary["name"])
+            node_relationships.extend(get_node_relationships(dictionary))
+            label_bytes[0] += len(dictionary["label"])
+
+            yield dictionary
+
+    stream.write(_graph_header)
+    _write_joined(stream, build_dot_nodes(remember_node(node_dictionaries)), "\n")
+    stream.write("\n\n")
+
+    edges = build_edges(args_list, node_names, node_relationships)
+    _write_joined(stream, [edge[2] for edge in edges], "\n")
+    stream.write(_graph_footer)
+
+    return _build_graph_size(len(node_names), len(edges), label_bytes[0])
+
+
+def _build_cluster(n, label, node_dictionaries):
+    return '\tsubgraph "cluster_{}"\n\t{{\n\t\tlabel = "{}";\n{}\n\t}}'.format(
+        n, label, "\n".join(build_dot_nodes(node_dictionaries)))
+
+
+# Writes graph of partitions, which are list of (label, node dictionaries), and edges between
+# nodes, see build_edges. Every partition is drawn as cluster if clusters is set. Returns size of
+# graph, see write_graph
+def write_partitions_graph(stream, partitions, edges, clusters=False):
+    stream.write(_graph_header)
+    if clusters:
+        _write_joined(stream, (_build_cluster(n, label, node_dictionaries)
+                               for n, (label, node_dictionaries) in enumerate(partitions)), "\n")
+    else:
+        _write_joined(stream, build_dot_nodes(dictionary for _, node_dictionaries in partitions
+                                              for dictionary in node_dictionaries), "\n")
+    stream.write("\n\n")
+
+    _write_joined(stream, [edge[2] for edge in edges], "\n")
+    stream.write(_graph_footer)
+
+    node_dictionaries = [dictionary for _, node_dictionaries in partitions
+                         for dictionary in node_dictionaries]
+    return _build_graph_size(len(node_dictionaries), len(edges),
+                             sum(len(dictionary["label"]) for dictionary in node_dictionaries))
+
+
 def build_graph(args_list, node_dictionaries):
-    template = ('digraph "Class Diagram"\n'
-                '{{\n'
-                '\tbgcolor = transparent;\n'
-                '\trankdir = LR;\n'
-                '\tedge [fontname = Helvetica, fontsize = 10, labelfontname = Helvetica, '
-                'labelfontsize = 10];\n'
-                '\tnode [fontname = Helvetica, fontsize = 10, shape = none, margin = 0, '
-                'style = filled, fillcolor = grey75, fontcolor = black ];\n'
-                '\n'
-                '{}\n'
-                '\n'
-                '{}\n'
-                '}}')
-
-    nodes = build_dot_nodes(node_dictionaries)
-    node_names = [dictionary["name"] for dictionary in node_dictionaries]
-    relationships = build_relationships(args_list, node_names)
-    return template.format("\n".join(nodes), "\n".join(relationships))
+    stream = StringIO()
+    write_graph(stream, args_list, node_dictionaries)
+    return stream.getvalue()
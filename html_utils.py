@@ -1,20 +1,22 @@
 #!/usr/bin/python
-import re
+from parser.models import Qualifiers
+from uml_utils import build_uml_property_representation, build_uml_method_representation
 
 
 def _replace_html_specific_characters(string):
     return string.replace("&", "&#38;").replace("<", "&#60;").replace(">", "&#62;")
 
 
-def _underline_if_static(declaration):
-    if re.search(r":.* static .*", declaration):
+def _underline_if_static(declaration, qualifiers):
+    if qualifiers & Qualifiers.STATIC:
         return "<u>{}</u>".format(declaration)
 
     return declaration
 
 
-def _italic_if_pure_virtual(declaration):
-    if re.search(r":.*= 0.*", declaration):
+# Virtual methods are represented as pure ones, with "= 0"
+def _italic_if_pure_virtual(declaration, qualifiers):
+    if qualifiers & (Qualifiers.PURE | Qualifiers.VIRTUAL):
         return "<i>{}</i>".format(declaration)
 
     return declaration
@@ -31,8 +33,8 @@ def _format_if_too_long(declaration, max_chars, spacing=8):
 def _format_uml_properties_to_html(properties):
     results = []
     for p in properties:
-        result = _replace_html_specific_characters(p)
-        result = _underline_if_static(result)
+        result = _replace_html_specific_characters(build_uml_property_representation(p))
+        result = _underline_if_static(result, p.qualifiers)
         results.append(result)
 
     return results
@@ -41,16 +43,27 @@ def _format_uml_properties_to_html(properties):
 def _format_uml_methods_to_html(methods):
     results = []
     for m in methods:
-        result = _replace_html_specific_characters(m)
-        result = _underline_if_static(result)
-        result = _italic_if_pure_virtual(result)
+        result = _replace_html_specific_characters(build_uml_method_representation(m))
+        result = _underline_if_static(result, m.qualifiers)
+        result = _italic_if_pure_virtual(result, m.qualifiers)
         result = _format_if_too_long(result, 100)
         results.append(result)
 
     return results
 
 
-def format_uml_class_features_to_html(full_name, properties, methods):
+# Members hidden by detail are summarized by "+K more" row
+def _append_hidden_members_row(results, hidden_count):
+    if hidden_count:
+        results.append("<i>+{} more</i>".format(hidden_count))
+
+    return results
+
+
+# properties and methods are field and method records, hidden counts are counts of members which
+# are not parsed, see Detail
+def format_uml_class_features_to_html(full_name, properties, methods, hidden_properties_count=0,
+                                      hidden_methods_count=0):
     template = ('<<table border="0" cellspacing="0" cellborder="1">\n'
                 '\t<tr>\n'
                 '\t\t<td>{}</td>\n'
@@ -64,7 +77,9 @@ def format_uml_class_features_to_html(full_name, properties, methods):
                 '</table>>\n')
 
     full_name = _replace_html_specific_characters(full_name)
-    properties = _format_uml_properties_to_html(properties)
-    methods = _format_uml_methods_to_html(methods)
+    properties = _append_hidden_members_row(_format_uml_properties_to_html(properties),
+                                            hidden_properties_count)
+    methods = _append_hidden_members_row(_format_uml_methods_to_html(methods),
+                                         hidden_methods_count)
 
     return template.format(full_name, '<br />'.join(properties), '<br />'.join(methods))
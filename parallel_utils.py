@@ -0,0 +1,72 @@
+#!/usr/bin/python
+import multiprocessing
+from parser.file_classes_parser import parse_selected_classes
+from parser.cindex_wrappers.file_declarations_parser import FileDeclarationsParser
+from parser.cindex_wrappers.translation_unit_registry import TranslationUnitRegistry
+
+
+# group is tuple of cache, extraction, detail, skip_includes, with_relationships, precompiled
+# header and list of (position, file_path, selector, clang_arguments)
+def _parse_classes_group(group):
+    (cache, extraction, detail, skip_includes, with_relationships, precompiled_header,
+     requests) = group
+    registry = TranslationUnitRegistry(precompiled_header)
+    memo = {}
+
+    results = []
+    for position, file_path, selector, clang_arguments in requests:
+        if selector not in memo:
+            memo[selector] = parse_selected_classes(file_path, selector, clang_arguments,
+                                                    registry, cache, extraction, detail,
+                                                    skip_includes, with_relationships)
+
+        results.append((position, memo[selector]))
+
+    return results
+
+
+def _group_requests_by_file(requests, cache, extraction, detail, skip_includes,
+                            with_relationships, precompiled_header):
+    groups = {}
+    for position, (file_path, selector, clang_arguments) in enumerate(requests):
+        key = TranslationUnitRegistry.build_key(file_path, clang_arguments)
+        groups.setdefault(key, []).append((position, file_path, selector, clang_arguments))
+
+    # Biggest groups go first to keep workers busy till the end
+    return sorted(((cache, extraction, detail, skip_includes, with_relationships,
+                    precompiled_header, group_requests) for group_requests in groups.values()),
+                  key=lambda group: len(group[6]), reverse=True)
+
+
+# Precompiled header is built for clang args of every file before workers start, so it is built
+# once and not by every worker
+def _build_precompiled_headers(requests, skip_includes, precompiled_header):
+    registry = TranslationUnitRegistry(precompiled_header)
+    for file_path, selector, clang_arguments in requests:
+        FileDeclarationsParser(file_path, clang_arguments, registry,
+                               skip_includes).get_precompiled_header_path()
+
+
+# requests is list of (file_path, selector, clang_arguments).
+# Yields parsed classes lists for every request, in the same order
+def parse_classes_in_parallel(requests, jobs, cache=None, extraction="text", detail=None,
+                              skip_includes=False, with_relationships=False,
+                              precompiled_header=None):
+    parsed_results = {}
+    next_position = 0
+    if precompiled_header is not None:
+        _build_precompiled_headers(requests, skip_includes, precompiled_header)
+
+    groups = _group_requests_by_file(requests, cache, extraction, detail, skip_includes,
+                                     with_relationships, precompiled_header)
+
+    pool = multiprocessing.Pool(jobs)
+    try:
+        for group_results in pool.imap_unordered(_parse_classes_group, groups):
+            parsed_results.update(group_results)
+            while next_position in parsed_results:
+                yield parsed_results.pop(next_position)
+                next_position += 1
+    finally:
+        pool.terminate()
+        pool.join()
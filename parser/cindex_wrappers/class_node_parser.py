@@ -1,20 +1,51 @@
 #!/usr/bin/python
 from source_range_wrapper import SourceRangeWrapper
+from parser.models import Class, Field, Method, Parameter, Qualifiers, Relationship
+from parser.models import intern_string
 import clang.cindex
+import ctypes
 import re
 
 
 class ClassNodeParser:
-    def __init__(self, node, parent_nodes):
+    _method_kinds = [clang.cindex.CursorKind.CXX_METHOD,
+                     clang.cindex.CursorKind.FUNCTION_TEMPLATE,
+                     clang.cindex.CursorKind.DESTRUCTOR,
+                     clang.cindex.CursorKind.CONSTRUCTOR]
+
+    _field_kinds = [clang.cindex.CursorKind.FIELD_DECL, clang.cindex.CursorKind.VAR_DECL]
+
+    _class_kinds = [clang.cindex.CursorKind.CLASS_TEMPLATE,
+                    clang.cindex.CursorKind.CLASS_DECL,
+                    clang.cindex.CursorKind.CLASS_TEMPLATE_PARTIAL_SPECIALIZATION,
+                    clang.cindex.CursorKind.STRUCT_DECL]
+
+    _indirect_type_kinds = [clang.cindex.TypeKind.POINTER,
+                            clang.cindex.TypeKind.LVALUEREFERENCE,
+                            clang.cindex.TypeKind.RVALUEREFERENCE]
+
+    _template_parameter_kinds = [clang.cindex.CursorKind.TEMPLATE_TYPE_PARAMETER,
+                                 clang.cindex.CursorKind.TEMPLATE_NON_TYPE_PARAMETER,
+                                 clang.cindex.CursorKind.TEMPLATE_TEMPLATE_PARAMETER]
+
+    _type_keywords = frozenset(["bool", "char", "char16_t", "char32_t", "double", "float", "int",
+                                "long", "short", "signed", "unsigned", "void", "wchar_t",
+                                "const", "volatile", "auto"])
+
+    _closed_brackets = {")": "(", "]": "[", "}": "{", ">": "<"}
+
+    # skip_includes is set if file is parsed without includes, see FileDeclarationsParser
+    def __init__(self, node, namespace, skip_includes=False):
         self.node = node
-        self.parent_nodes = parent_nodes
+        self.namespace = namespace
+        self.skip_includes = skip_includes
 
     def _parse_method_parameter_node(self, parameters_node):
         declaration = SourceRangeWrapper(parameters_node.extent).read()
         if declaration is None:
             return None
 
-        return {"name": parameters_node.spelling, "declaration": declaration}
+        return Parameter(parameters_node.spelling, declaration=declaration)
 
     def _parse_method_parameters_nodes(self, method_nodes):
         results = []
@@ -28,6 +59,111 @@ class ClassNodeParser:
 
         return results
 
+    # Python bindings don't declare clang_isInvalidDeclaration, which is available since
+    # libclang 7. Declarations are considered invalid if it is missing
+    @staticmethod
+    def _is_invalid_declaration(node):
+        lib = clang.cindex.conf.lib
+        is_invalid_declaration = getattr(lib, "clang_isInvalidDeclaration", None)
+        if is_invalid_declaration is None:
+            return True
+
+        if is_invalid_declaration.restype is not ctypes.c_uint:
+            is_invalid_declaration.argtypes = [clang.cindex.Cursor]
+            is_invalid_declaration.restype = ctypes.c_uint
+
+        return bool(is_invalid_declaration(node))
+
+    # Parameters of declaration which libclang marked invalid, e.g. because of types unresolved
+    # without includes, have no nodes. They are split from declaration source text instead.
+    # Valid declarations could have more parameters nodes than parameters, e.g. if they return
+    # function pointer, so they are not split
+    def _has_missing_parameters_nodes(self, node):
+        if not self.skip_includes or node.type.kind is not clang.cindex.TypeKind.FUNCTIONPROTO:
+            return False
+
+        parameters_count = len(node.type.argument_types())
+        return (parameters_count != len([child for child in node.get_children()
+                                         if child.kind is clang.cindex.CursorKind.PARM_DECL]) and
+                ClassNodeParser._is_invalid_declaration(node))
+
+    # Returns position after string or character literal starting at pos
+    @staticmethod
+    def _skip_literal(declaration, pos):
+        quote = declaration[pos]
+        pos += 1
+        while pos < len(declaration) and declaration[pos] != quote:
+            pos += 2 if declaration[pos] == "\\" else 1
+
+        return pos + 1
+
+    # "<" after identifier opens template arguments, otherwise it is comparison or shift
+    @staticmethod
+    def _is_template_bracket(declaration, pos):
+        if declaration[pos - 1:pos] == "<" or declaration[pos + 1:pos + 2] == "<":
+            return False
+
+        return re.search(r"(?<!\w)[a-zA-Z_]\w*\s*$", declaration[:pos]) is not None
+
+    # Splits parameters of method name by commas outside of brackets and literals. ">" closes
+    # template arguments only, so "->" and comparisons in default values are skipped
+    @staticmethod
+    def _split_parameters_declarations(declaration, name):
+        match = re.search(r"\b{}\s*\(".format(re.escape(name)), declaration)
+        if not match:
+            return []
+
+        results = []
+        open_brackets = []
+        start = match.end()
+        pos = match.end() - 1
+        while pos < len(declaration):
+            sym = declaration[pos]
+            if sym in "\"'":
+                pos = ClassNodeParser._skip_literal(declaration, pos)
+                continue
+
+            if sym in "([{" or (sym == "<" and
+                                ClassNodeParser._is_template_bracket(declaration, pos)):
+                open_brackets.append(sym)
+            elif sym in ")]}" or (sym == ">" and open_brackets[-1:] == ["<"] and
+                                  declaration[pos - 1] != "-"):
+                # template brackets which are not closed were comparisons
+                open_bracket = ClassNodeParser._closed_brackets[sym]
+                while open_brackets and open_brackets.pop() != open_bracket:
+                    pass
+
+                if not open_brackets:
+                    results.append(declaration[start:pos])
+                    break
+            elif sym == "," and len(open_brackets) == 1:
+                results.append(declaration[start:pos])
+                start = pos + 1
+
+            pos += 1
+
+        return [result.strip() for result in results
+                if result.strip() and result.strip() not in ["void", "..."]]
+
+    @staticmethod
+    def _parse_parameter_name(declaration):
+        declaration = declaration.split("=", 1)[0]
+        match = re.search(r"([a-zA-Z_]\w*)\s*(\[[^\]]*\])?\s*$", declaration)
+        if not match:
+            return ""
+
+        type = declaration[:match.start()].strip()
+        if not type or type.endswith("::") or match.group(1) in ClassNodeParser._type_keywords:
+            return ""
+
+        return match.group(1)
+
+    def _parse_method_parameters_declarations(self, node, declaration):
+        return [Parameter(self._parse_parameter_name(parameter_declaration),
+                          declaration=parameter_declaration)
+                for parameter_declaration in self._split_parameters_declarations(
+                    declaration, self._parse_method_name(node))]
+
     # WORKAROUND Template Construct/Destructor
     def _match_method_name(self, spelling):
         match = re.search(r"^~?[a-zA-Z_][a-zA-Z0-9_]*", spelling)
@@ -37,61 +173,271 @@ class ClassNodeParser:
 
         return match.group(0)
 
-    def _parse_method_node(self, node):
-        result = {}
-
-        result["access_specifier"] = node.access_specifier.name
-
+    def _parse_method_name(self, node):
         name = node.spelling
         if "<" in name:
             name = self._match_method_name(name)
-        result["name"] = name
 
-        result["declaration"] = SourceRangeWrapper(node.extent).read()
+        return name
+
+    @staticmethod
+    def _parse_method_kind_qualifiers(node):
+        if node.kind is clang.cindex.CursorKind.CONSTRUCTOR:
+            return Qualifiers.CONSTRUCTOR
+        elif node.kind is clang.cindex.CursorKind.DESTRUCTOR:
+            return Qualifiers.DESTRUCTOR
+
+        return 0
 
-        parameters = self._parse_method_parameters_nodes(node.get_children())
+    def _parse_method_node(self, node):
+        declaration = SourceRangeWrapper(node.extent).read()
+
+        if declaration is not None and self._has_missing_parameters_nodes(node):
+            parameters = self._parse_method_parameters_declarations(node, declaration)
+        else:
+            parameters = self._parse_method_parameters_nodes(node.get_children())
         if parameters is None:
             return None
 
-        result["parameters"] = parameters
+        return Method(self._parse_method_name(node), node.access_specifier.name, parameters,
+                      qualifiers=self._parse_method_kind_qualifiers(node),
+                      declaration=declaration)
 
-        qualifiers = []
-        if node.kind is clang.cindex.CursorKind.CONSTRUCTOR:
-            qualifiers = ["constructor"]
-        elif node.kind is clang.cindex.CursorKind.DESTRUCTOR:
-            qualifiers = ["destructor"]
-        result["qualifiers"] = qualifiers
+    def _parse_field_node(self, node):
+        return Field(node.spelling, node.access_specifier.name,
+                     declaration=SourceRangeWrapper(node.extent).read())
 
-        return result
+    # Semantic parsing fills the same records as text parsing with declaration info, but
+    # takes it from libclang types instead of source text. Types are prefixed with the same
+    # specifiers as in text parsing, e.g. "static int"
 
-    def _parse_method_nodes(self, nodes):
-        results = []
-        for node in nodes:
-            if node.kind in [clang.cindex.CursorKind.CXX_METHOD,
-                             clang.cindex.CursorKind.FUNCTION_TEMPLATE,
-                             clang.cindex.CursorKind.DESTRUCTOR,
-                             clang.cindex.CursorKind.CONSTRUCTOR]:
-                result = self._parse_method_node(node)
-                if result is None:
-                    print "WARNING: Failed to parse method:", SourceRangeWrapper(node.extent).read()
-                    continue
+    @staticmethod
+    def _is_const_type(type):
+        while True:
+            if type.is_const_qualified():
+                return True
 
-                results.append(result)
+            if type.kind not in ClassNodeParser._indirect_type_kinds:
+                return False
 
-        return results
+            type = type.get_pointee()
 
-    def _parse_field_node(self, node):
-        return {"name": node.spelling,
-                "declaration": SourceRangeWrapper(node.extent).read(),
-                "access_specifier": node.access_specifier.name}
+    @staticmethod
+    def _build_semantic_type(type_spelling, qualifiers, type_qualifiers):
+        specifiers = Qualifiers.to_names(qualifiers & type_qualifiers)
+        return " ".join(specifiers + [type_spelling])
 
-    def _parse_field_nodes(self, nodes):
-        results = []
-        for node in nodes:
-            if node.kind in [clang.cindex.CursorKind.FIELD_DECL, clang.cindex.CursorKind.VAR_DECL]:
-                results.append(self._parse_field_node(node))
+    def _parse_property_qualifiers_semantically(self, node, qualifiers):
+        if ClassNodeParser._is_const_type(node.type):
+            qualifiers |= Qualifiers.CONST
 
-        return results
+        return qualifiers
+
+    def _parse_property_type_semantically(self, node, qualifiers):
+        return self._build_semantic_type(node.type.spelling, qualifiers,
+                                         Qualifiers.STATIC | Qualifiers.MUTABLE)
+
+    def _parse_parameter_node_semantically(self, node):
+        qualifiers = self._parse_property_qualifiers_semantically(node, 0)
+        return Parameter(node.spelling, self._parse_property_type_semantically(node, qualifiers),
+                         qualifiers)
+
+    def _parse_field_node_semantically(self, node):
+        qualifiers = 0
+        if node.kind is clang.cindex.CursorKind.VAR_DECL:
+            qualifiers |= Qualifiers.STATIC
+
+        if node.kind is clang.cindex.CursorKind.FIELD_DECL and node.is_mutable_field():
+            qualifiers |= Qualifiers.MUTABLE
+
+        qualifiers = self._parse_property_qualifiers_semantically(node, qualifiers)
+        return Field(node.spelling, node.access_specifier.name,
+                     self._parse_property_type_semantically(node, qualifiers), qualifiers)
+
+    @staticmethod
+    def _build_template_parameter_declaration(node):
+        if node.kind is clang.cindex.CursorKind.TEMPLATE_TYPE_PARAMETER:
+            return "typename {}".format(node.spelling)
+        elif node.kind is clang.cindex.CursorKind.TEMPLATE_NON_TYPE_PARAMETER:
+            return "{} {}".format(node.type.spelling, node.spelling)
+
+        return "template <{}> class {}".format(
+            ", ".join(ClassNodeParser._build_template_parameters_declarations(node)),
+            node.spelling)
+
+    @staticmethod
+    def _build_template_parameters_declarations(node):
+        return [ClassNodeParser._build_template_parameter_declaration(child)
+                for child in node.get_children()
+                if child.kind in ClassNodeParser._template_parameter_kinds]
+
+    # is_explicit_method is available in newer libclang bindings only
+    @staticmethod
+    def _is_explicit_method(node):
+        is_explicit_method = getattr(node, "is_explicit_method", None)
+        return bool(is_explicit_method and is_explicit_method())
+
+    def _parse_method_node_semantically(self, node):
+        children = list(node.get_children())
+        children_kinds = set(child.kind for child in children)
+
+        parameters = [self._parse_parameter_node_semantically(child) for child in children
+                      if child.kind is clang.cindex.CursorKind.PARM_DECL]
+
+        is_override = clang.cindex.CursorKind.CXX_OVERRIDE_ATTR in children_kinds
+        is_constructor = node.kind is clang.cindex.CursorKind.CONSTRUCTOR
+        is_destructor = node.kind is clang.cindex.CursorKind.DESTRUCTOR
+
+        qualifiers = 0
+        template_declaration = None
+        if node.kind is clang.cindex.CursorKind.FUNCTION_TEMPLATE:
+            qualifiers |= Qualifiers.TEMPLATE
+            template_declaration = "template <{}>".format(
+                ", ".join(self._build_template_parameters_declarations(node)))
+
+        # virtual is not repeated by overriding methods
+        if node.is_virtual_method() and not is_override:
+            qualifiers |= Qualifiers.VIRTUAL
+        if node.is_static_method():
+            qualifiers |= Qualifiers.STATIC
+        if self._is_explicit_method(node):
+            qualifiers |= Qualifiers.EXPLICIT
+
+        if is_override:
+            qualifiers |= Qualifiers.OVERRIDE
+        if node.is_const_method():
+            qualifiers |= Qualifiers.CONST
+        if node.is_pure_virtual_method():
+            qualifiers |= Qualifiers.PURE
+        if node.availability is clang.cindex.AvailabilityKind.NOT_AVAILABLE:
+            qualifiers |= Qualifiers.DELETED
+        if node.is_default_method():
+            qualifiers |= Qualifiers.DEFAULT
+
+        if is_constructor:
+            qualifiers |= Qualifiers.CONSTRUCTOR
+        elif is_destructor:
+            qualifiers |= Qualifiers.DESTRUCTOR
+
+        if is_constructor or is_destructor:
+            type = ""
+        else:
+            type = self._build_semantic_type(
+                node.result_type.spelling, qualifiers,
+                Qualifiers.VIRTUAL | Qualifiers.STATIC | Qualifiers.EXPLICIT)
+
+        return Method(self._parse_method_name(node), node.access_specifier.name, parameters,
+                      type, qualifiers, template_declaration)
+
+    @staticmethod
+    def _build_declaration_full_name(declaration):
+        names = []
+        while declaration and declaration.kind is not clang.cindex.CursorKind.TRANSLATION_UNIT:
+            names.append(declaration.spelling)
+            declaration = declaration.semantic_parent
+
+        return "::".join(reversed(names))
+
+    @staticmethod
+    def _build_relationship(rtype, declaration):
+        if declaration.kind not in ClassNodeParser._class_kinds:
+            return None
+
+        return Relationship(rtype, intern_string(
+            ClassNodeParser._build_declaration_full_name(declaration)))
+
+    def _parse_base_node(self, node):
+        declaration = node.type.get_declaration()
+        rtype = "realization" if declaration.is_abstract_record() else "inheritance"
+        return self._build_relationship(rtype, declaration)
+
+    # Value field is composition, pointer or reference field is aggregation
+    def _parse_field_type_relationship(self, node):
+        field_type = node.type.get_canonical()
+        if field_type.kind in ClassNodeParser._indirect_type_kinds:
+            pointee_declaration = field_type.get_pointee().get_declaration()
+            return self._build_relationship("aggregation", pointee_declaration)
+
+        return self._build_relationship("composition", field_type.get_declaration())
+
+    # Returns False if member is not shown by detail, see Detail. Members above max_members are
+    # hidden, their source text is not read
+    @staticmethod
+    def _is_member_shown(node, detail, shown_members_count):
+        if detail is None:
+            return True
+
+        if detail.level == "public" and (node.access_specifier is not
+                                         clang.cindex.AccessSpecifier.PUBLIC):
+            return False
+
+        return detail.max_members is None or shown_members_count < detail.max_members
+
+    @staticmethod
+    def _is_counted_as_hidden(node, detail):
+        return detail.level != "public" or (node.access_specifier is
+                                            clang.cindex.AccessSpecifier.PUBLIC)
+
+    # Only names are kept, types are not parsed
+    def _parse_method_node_name(self, node):
+        return Method(self._parse_method_name(node), node.access_specifier.name, [],
+                      qualifiers=self._parse_method_kind_qualifiers(node))
+
+    def _parse_member_node(self, node, semantic, detail):
+        is_names_only = detail is not None and detail.level == "names"
+        if node.kind in ClassNodeParser._method_kinds:
+            if is_names_only:
+                return self._parse_method_node_name(node)
+            elif semantic:
+                return self._parse_method_node_semantically(node)
+
+            result = self._parse_method_node(node)
+            if result is None:
+                print "WARNING: Failed to parse method:", SourceRangeWrapper(node.extent).read()
+
+            return result
+
+        if is_names_only:
+            return Field(node.spelling, node.access_specifier.name)
+        elif semantic:
+            return self._parse_field_node_semantically(node)
+
+        return self._parse_field_node(node)
+
+    # Relationships are parsed from all fields and bases, also from hidden ones, if
+    # with_relationships is set. Returns methods, fields, relationships and counts of hidden
+    # methods and fields
+    def _parse_member_nodes(self, nodes, semantic=False, detail=None, with_relationships=False):
+        methods = []
+        fields = []
+        relationships = []
+        hidden_methods_count = 0
+        hidden_fields_count = 0
+        for node in nodes:
+            relationship = None
+            if node.kind in ClassNodeParser._method_kinds:
+                if ClassNodeParser._is_member_shown(node, detail, len(methods)):
+                    result = self._parse_member_node(node, semantic, detail)
+                    if result is not None:
+                        methods.append(result)
+                elif ClassNodeParser._is_counted_as_hidden(node, detail):
+                    hidden_methods_count += 1
+            elif node.kind in ClassNodeParser._field_kinds:
+                if ClassNodeParser._is_member_shown(node, detail, len(fields)):
+                    fields.append(self._parse_member_node(node, semantic, detail))
+                elif ClassNodeParser._is_counted_as_hidden(node, detail):
+                    hidden_fields_count += 1
+
+                if with_relationships and node.kind is clang.cindex.CursorKind.FIELD_DECL:
+                    relationship = self._parse_field_type_relationship(node)
+            elif (with_relationships and
+                  node.kind is clang.cindex.CursorKind.CXX_BASE_SPECIFIER):
+                relationship = self._parse_base_node(node)
+
+            if relationship and relationship not in relationships:
+                relationships.append(relationship)
+
+        return methods, fields, relationships, hidden_methods_count, hidden_fields_count
 
     @staticmethod
     def _match_class_declaration(class_declaration):
@@ -125,25 +471,19 @@ class ClassNodeParser:
 
         return result
 
-    def _build_class_namespace(self):
-        result = str()
-        for node in self.parent_nodes:
-            name = node.spelling
-            result += "::{}".format(name) if result else name
-
-        return result
-
     def build_class_full_name(self):
-        namespace = self._build_class_namespace()
-        if namespace:
-            return "{}::{}".format(namespace, self.node.spelling)
+        if self.namespace:
+            return "{}::{}".format(self.namespace, self.node.spelling)
 
         return self.node.spelling
 
-    def parse(self):
-        return {"namespace": self._build_class_namespace(),
-                "name": self.node.spelling,
-                "full_name": self.build_class_full_name(),
-                "declaration": self._parse_class_declaration(),
-                "methods": self._parse_method_nodes(self.node.get_children()),
-                "fields": self._parse_field_nodes(self.node.get_children())}
+    # Members are parsed with declaration info if semantic is set, source text isn't read then.
+    # Members are filtered by detail, see Detail. Relationships to classes of fields and bases
+    # are parsed if with_relationships is set
+    def parse(self, semantic=False, detail=None, with_relationships=False):
+        methods, fields, relationships, hidden_methods_count, hidden_fields_count = (
+            self._parse_member_nodes(self.node.get_children(), semantic, detail,
+                                     with_relationships))
+        return Class(self.namespace, self.node.spelling, self.build_class_full_name(),
+                     None if semantic else self._parse_class_declaration(), methods, fields,
+                     relationships, hidden_methods_count, hidden_fields_count)
@@ -1,15 +1,27 @@
 #!/usr/bin/python
 from class_node_parser import ClassNodeParser
+from translation_unit_registry import TranslationUnitRegistry
+from parser.name_resolver import NameResolver
+from collections import OrderedDict
 import clang.cindex
 import os
 
 
 class FileDeclarationsParser:
-    def __init__(self, file_path, clang_args=None):
+    # File is parsed without its includes if skip_includes is set, so types declared in them are
+    # unresolved. It is much faster, and members source text is the same
+    def __init__(self, file_path, clang_args=None, registry=None, skip_includes=False):
         self.file_path = file_path
         self.clang_args = clang_args
+        self.registry = registry if registry is not None else TranslationUnitRegistry()
+        self.skip_includes = skip_includes
         self.options = clang.cindex.TranslationUnit.PARSE_SKIP_FUNCTION_BODIES
+        if skip_includes:
+            self.options |= (clang.cindex.TranslationUnit.PARSE_INCOMPLETE |
+                             TranslationUnitRegistry.SKIP_INCLUDES)
+        self._append_clang_source_args()
 
+        self.translation_unit = None
         self.cached_file_nodes = None
 
     def _is_class(self, node_kind):
@@ -18,42 +30,65 @@ class FileDeclarationsParser:
                              clang.cindex.CursorKind.CLASS_TEMPLATE_PARTIAL_SPECIALIZATION,
                              clang.cindex.CursorKind.STRUCT_DECL]
 
-    def _filter_class_nodes(self, nodes, parent_nodes=None):
-        results = []
-
-        if parent_nodes is None:
-            parent_nodes = []
-
-        for node in nodes:
-            if node.kind is clang.cindex.CursorKind.NAMESPACE or self._is_class(node.kind):
-                if self._is_class(node.kind):
-                    results.append({"parent_nodes": parent_nodes, "class_node": node})
-
-                class_nodes = self._filter_class_nodes(node.get_children(), parent_nodes + [node])
-                if class_nodes:
-                    results = results + class_nodes
-
-        return results
+    # Lazily yields full name and class node parser of every class in nodes and their subtrees.
+    # Namespace or class subtree is skipped if is_prefix_matching returns False for its full
+    # name followed by "::", which means that no class inside it could match.
+    def _iterate_class_nodes(self, nodes, is_prefix_matching=None):
+        stack = [(iter(nodes), "")]
+        while stack:
+            children, namespace = stack[-1]
+            node = next(children, None)
+            if node is None:
+                stack.pop()
+                continue
+
+            is_class = self._is_class(node.kind)
+            if node.kind is not clang.cindex.CursorKind.NAMESPACE and not is_class:
+                continue
+
+            full_name = node.spelling
+            if namespace:
+                full_name = "{}::{}".format(namespace, full_name)
+
+            if is_class:
+                # FIXME: Class definition, previosly declared in header in other class is not
+                # parsed
+                yield full_name, ClassNodeParser(node, namespace, self.skip_includes)
+
+            if is_prefix_matching is None or is_prefix_matching(full_name + "::"):
+                stack.append((node.get_children(), full_name))
+
+    def _index_class_nodes(self, nodes, is_prefix_matching=None):
+        class_index = OrderedDict()
+        for full_name, parser in self._iterate_class_nodes(nodes, is_prefix_matching):
+            class_index.setdefault(full_name, []).append(parser)
+
+        return class_index
+
+    def _append_clang_arg(self, arg):
+        if self.clang_args is None:
+            self.clang_args = []
+
+        # clang args could be shared with other files, so they are not modified in place
+        if arg not in self.clang_args:
+            self.clang_args = self.clang_args + [arg]
 
     def _append_clang_source_args(self):
         file_ext = os.path.splitext(self.file_path)[1]
         if file_ext in [".cpp"]:
-            if self.clang_args is None:
-                self.clang_args = []
+            self._append_clang_arg("-xc++")
 
-            arg = "-xc++"
-            if arg not in self.clang_args:
-                self.clang_args.append(arg)
+        # Unresolved types are errors, parsing must not stop after too many of them
+        if self.skip_includes:
+            self._append_clang_arg("-ferror-limit=0")
 
     def _parse_file_nodes(self):
         if self.cached_file_nodes is not None:
             return self.cached_file_nodes
 
-        self._append_clang_source_args()
-
         try:
-            index = clang.cindex.Index.create()
-            parsed_file = index.parse(self.file_path, args=self.clang_args, options=self.options)
+            parsed_file = self.registry.parse(self.file_path, self.clang_args, self.options)
+            self.translation_unit = parsed_file
 
             file_nodes = parsed_file.cursor.get_children()
             self.cached_file_nodes = filter(
@@ -61,48 +96,90 @@ class FileDeclarationsParser:
         except clang.cindex.TranslationUnitLoadError as error:
             print("Failed to parse file '{}' with clang args '{}': {}".format(
                 self.file_path, self.clang_args, error))
+            self.cached_file_nodes = []
 
         return self.cached_file_nodes
 
-    def for_each_class_node_parser(self, func):
+    # Returns path of precompiled header which file is parsed with, see PrecompiledHeader. Path
+    # of built header contains hash of its inputs. None if there is no precompiled header
+    def get_precompiled_header_path(self):
+        precompiled_header = self.registry.precompiled_header
+        if precompiled_header is None:
+            return None
+
+        args = precompiled_header.extend_clang_args(self.clang_args or [])
+        return args[-1] if len(args) > len(self.clang_args or []) else None
+
+    def parse_included_files(self):
+        if not self._parse_file_nodes():
+            return []
+
+        return [inclusion.include.name for inclusion in self.translation_unit.get_includes()]
+
+    # Returns ordered dictionary of class full name to list of class node parsers. It is built
+    # once per translation unit
+    def build_class_index(self):
         file_nodes = self._parse_file_nodes()
         if not file_nodes:
-            return
+            return OrderedDict()
 
-        class_nodes = self._filter_class_nodes(self.cached_file_nodes)
-        for node in class_nodes:
-            # FIXME: Class definition, previosly declared in header in other class is not parsed
-            parser = ClassNodeParser(node["class_node"], node["parent_nodes"])
-            func(parser)
+        key = TranslationUnitRegistry.build_key(self.file_path, self.clang_args, self.options)
+        class_index = self.registry.class_indexes.get(key)
+        if class_index is None:
+            class_index = self._index_class_nodes(file_nodes)
+            self.registry.class_indexes[key] = class_index
 
-    def parse_classes(self, full_name):
-        results = []
+        return class_index
 
-        def func(parser):
-            actual_full_name = parser.build_class_full_name()
-            if actual_full_name is None:
-                spelling = parser.node.spelling
-                print "Couldn't build full name. Class name: {}".format(spelling)
-            elif actual_full_name == full_name:
-                result = parser.parse()
-                results.append(result)
+    # Returns class index without subtrees skipped by is_prefix_matching, see
+    # _iterate_class_nodes. Complete class index is used if it is already built
+    def _build_pruned_class_index(self, is_prefix_matching):
+        file_nodes = self._parse_file_nodes()
+        key = TranslationUnitRegistry.build_key(self.file_path, self.clang_args, self.options)
+        if not file_nodes or key in self.registry.class_indexes:
+            return self.build_class_index()
+
+        return self._index_class_nodes(file_nodes, is_prefix_matching)
+
+    def parse_classes(self, full_name, semantic=False, detail=None, with_relationships=False):
+        return [parser.parse(semantic, detail, with_relationships)
+                for parser in self.build_class_index().get(full_name, [])]
+
+    # Parses definitions of all classes whose full names satisfy is_matching predicate.
+    # is_prefix_matching could tell which namespaces have no matching classes, so they are
+    # skipped, see _iterate_class_nodes. Members are filtered by detail and relationships are
+    # parsed if with_relationships is set, see ClassNodeParser.parse
+    def parse_matching_classes(self, is_matching, semantic=False, is_prefix_matching=None,
+                               detail=None, with_relationships=False):
+        if is_prefix_matching is None:
+            class_index = self.build_class_index()
+        else:
+            class_index = self._build_pruned_class_index(is_prefix_matching)
 
-            return None
+        results = []
+        for full_name, parsers in class_index.iteritems():
+            if is_matching(full_name):
+                results.extend([parser.parse(semantic, detail, with_relationships)
+                                for parser in parsers
+                                if parser.node.is_definition()])
 
-        self.for_each_class_node_parser(func)
         return results
 
-    def parse_classes_full_names(self):
-        results = []
+    # Returns name resolver of classes full names. It is built once per translation unit
+    def build_name_resolver(self):
+        class_index = self.build_class_index()
+        key = TranslationUnitRegistry.build_key(self.file_path, self.clang_args, self.options)
+        resolver = self.registry.name_resolvers.get(key)
+        if resolver is None:
+            resolver = NameResolver(self.parse_classes_full_names())
+            if class_index:
+                self.registry.name_resolvers[key] = resolver
 
-        def func(parser):
-            result = parser.build_class_full_name()
-            if result is None:
-                spelling = parser.node.spelling
-                print "Couldn't build full name. Class name: {}".format(spelling)
-                return
+        return resolver
 
-            results.append(result)
+    def parse_classes_full_names(self):
+        results = []
+        for full_name, parsers in self.build_class_index().iteritems():
+            results.extend([full_name] * len(parsers))
 
-        self.for_each_class_node_parser(func)
         return results
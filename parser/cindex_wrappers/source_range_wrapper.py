@@ -2,13 +2,43 @@
 import os
 
 
+# Keeps one copy of every read file for the whole run
+class SourceBuffers:
+    buffers = {}
+
+    @staticmethod
+    def get(file_path):
+        file_path = os.path.abspath(file_path)
+        if file_path not in SourceBuffers.buffers:
+            SourceBuffers.buffers[file_path] = SourceBuffers._read_file(file_path)
+
+        return SourceBuffers.buffers[file_path]
+
+    @staticmethod
+    def forget(file_path=None):
+        if file_path is None:
+            SourceBuffers.buffers.clear()
+        else:
+            SourceBuffers.buffers.pop(os.path.abspath(file_path), None)
+
+    @staticmethod
+    def _read_file(file_path):
+        if not os.path.isfile(file_path):
+            print "Error: No such file: '{}'".format(file_path)
+            return None
+
+        with open(file_path, "rb") as file:
+            return file.read()
+
+
 class SourceRangeWrapper:
     def __init__(self, extent):
         start = extent.start
         end = extent.end
 
+        self.file_path = None
+
         if not start.file or not end.file:
-            self.source = None
             return
 
         if start.file.name != end.file.name:
@@ -16,34 +46,18 @@ class SourceRangeWrapper:
                 start.file.name, end.file.name)
             return
 
-        self.source = SourceRangeWrapper._read_extent(start.file.name)
-        self.start_line = extent.start.line - 1
-        self.start_column = extent.start.column - 1
-        self.end_line = extent.end.line - 1
-        self.end_column = extent.end.column - 1
+        self.file_path = start.file.name
+        self.start_offset = start.offset
+        self.end_offset = end.offset
 
     def read(self):
-        if not self.source:
+        if not self.file_path:
             return None
 
-        result = []
-        for i, line in enumerate(self.source):
-            if i in range(self.start_line, self.end_line + 1):
-                result.append(line)
-
-        result[-1] = result[-1][:self.end_column]
-        result[0] = result[0][self.start_column:]
+        source = SourceBuffers.get(self.file_path)
+        if not source:
+            return None
 
-        result = ''.join(result)
+        result = source[self.start_offset:self.end_offset]
         result = ' '.join(result.split())
         return result
-
-    @staticmethod
-    def _read_extent(file_path):
-        if not os.path.isfile(file_path):
-            print "Error: No such file: '{}'".format(file_path)
-
-        with open(file_path) as file:
-            return file.readlines()
-
-        return None
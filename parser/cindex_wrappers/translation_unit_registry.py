@@ -0,0 +1,176 @@
+#!/usr/bin/python
+import clang.cindex
+import ctypes
+import os
+import re
+from collections import OrderedDict
+
+
+class _ResourceUsageEntry(ctypes.Structure):
+    _fields_ = [("kind", ctypes.c_int), ("amount", ctypes.c_ulong)]
+
+
+class _ResourceUsage(ctypes.Structure):
+    _fields_ = [("data", ctypes.c_void_p), ("count", ctypes.c_uint),
+                ("entries", ctypes.POINTER(_ResourceUsageEntry))]
+
+
+# Python bindings don't declare functions reporting resource usage of translation unit
+def _get_resource_usage_functions():
+    lib = clang.cindex.conf.lib
+    get_usage = lib.clang_getCXTUResourceUsage
+    if get_usage.restype is not _ResourceUsage:
+        get_usage.argtypes = [clang.cindex.TranslationUnit]
+        get_usage.restype = _ResourceUsage
+        lib.clang_disposeCXTUResourceUsage.argtypes = [_ResourceUsage]
+        lib.clang_disposeCXTUResourceUsage.restype = None
+
+    return get_usage, lib.clang_disposeCXTUResourceUsage
+
+
+_include_directive_pattern = re.compile(r"^[ \t]*#[ \t]*(include|include_next|import)\b.*$",
+                                       re.MULTILINE)
+
+
+# Include directives are replaced with spaces, so offsets of the rest of source are kept
+def _blank_include_directives(source):
+    return _include_directive_pattern.sub(lambda match: " " * len(match.group(0)), source)
+
+
+# Translation units are kept in order of their last use, least recently used goes first.
+# Files are parsed with precompiled header if it is given, see PrecompiledHeader
+class TranslationUnitRegistry:
+    # Option of registry, not of libclang: main file is parsed without its include directives
+    SKIP_INCLUDES = 0x40000000
+
+    def __init__(self, precompiled_header=None):
+        self.precompiled_header = precompiled_header
+        self.index = None
+        self.translation_units = OrderedDict()
+        self.class_indexes = {}
+        # clang args with precompiled header which every translation unit is parsed with
+        self.precompiled_header_args = {}
+        self.name_resolvers = {}
+
+    @staticmethod
+    def _normalize_clang_args(clang_args):
+        if not clang_args:
+            return ()
+
+        return tuple(clang_args)
+
+    @staticmethod
+    def build_key(file_path, clang_args=None, options=0):
+        return (os.path.abspath(file_path),
+                TranslationUnitRegistry._normalize_clang_args(clang_args),
+                options)
+
+    def _get_index(self):
+        if self.index is None:
+            self.index = clang.cindex.Index.create()
+
+        return self.index
+
+    # Returns unsaved files which replace sources of translation unit of key
+    @staticmethod
+    def _build_unsaved_files(key):
+        if not key[2] & TranslationUnitRegistry.SKIP_INCLUDES:
+            return None
+
+        try:
+            with open(key[0], "rb") as f:
+                source = f.read()
+        except IOError as error:
+            raise clang.cindex.TranslationUnitLoadError(str(error))
+
+        return [(key[0], _blank_include_directives(source))]
+
+    # Raises clang.cindex.TranslationUnitLoadError if file could not be parsed
+    def parse(self, file_path, clang_args=None, options=0):
+        key = TranslationUnitRegistry.build_key(file_path, clang_args, options)
+        if key in self.translation_units:
+            translation_unit = self.translation_units.pop(key)
+            self.translation_units[key] = translation_unit
+            return translation_unit
+
+        translation_unit = self._parse_key(key)
+        self.translation_units[key] = translation_unit
+        return translation_unit
+
+    # Precompiled header is not used if file could not be parsed with it, e.g. if it was built
+    # for other language
+    def _parse_key(self, key):
+        args = list(key[1])
+        unsaved_files = TranslationUnitRegistry._build_unsaved_files(key)
+        options = key[2] & ~TranslationUnitRegistry.SKIP_INCLUDES
+        self.precompiled_header_args.pop(key, None)
+        if self.precompiled_header is not None:
+            precompiled_header_args = self.precompiled_header.extend_clang_args(args)
+            try:
+                result = self._get_index().parse(key[0], args=list(precompiled_header_args),
+                                                 unsaved_files=unsaved_files, options=options)
+                self.precompiled_header_args[key] = precompiled_header_args
+                return result
+            except clang.cindex.TranslationUnitLoadError:
+                print "Warning: Could not parse file '{}' with precompiled header '{}'".format(
+                    key[0], self.precompiled_header.path)
+
+        return self._get_index().parse(key[0], args=args, unsaved_files=unsaved_files,
+                                       options=options)
+
+    # Translation unit reparsed in place keeps its clang args, so it is parsed again if its
+    # precompiled header was rebuilt or could not be used
+    def _is_reparsed_in_place(self, key):
+        if self.precompiled_header is None:
+            return True
+
+        return (self.precompiled_header_args.get(key) ==
+                self.precompiled_header.extend_clang_args(key[1]))
+
+    # Returns main file and all files included by translation unit or by its precompiled header
+    def get_files(self, key):
+        translation_unit = self.translation_units[key]
+        results = [key[0]]
+        results.extend(os.path.abspath(inclusion.include.name)
+                       for inclusion in translation_unit.get_includes())
+        if self.precompiled_header is not None:
+            results.extend(self.precompiled_header.get_files(key[1]))
+
+        return results
+
+    # Returns number of bytes of memory used by translation unit, as reported by libclang
+    def get_memory_usage(self, key):
+        get_usage, dispose_usage = _get_resource_usage_functions()
+        usage = get_usage(self.translation_units[key])
+        try:
+            return sum(usage.entries[n].amount for n in range(usage.count))
+        finally:
+            dispose_usage(usage)
+
+    def forget(self, key):
+        self.translation_units.pop(key, None)
+        self.precompiled_header_args.pop(key, None)
+        self.class_indexes.pop(key, None)
+        self.name_resolvers.pop(key, None)
+
+    def forget_file(self, file_path):
+        file_path = os.path.abspath(file_path)
+        for key in self.translation_units.keys():
+            if key[0] == file_path:
+                self.forget(key)
+
+    # Reparses translation unit in place, see _is_reparsed_in_place. Translation unit is
+    # forgotten if reparse failed
+    def reparse(self, key):
+        self.class_indexes.pop(key, None)
+        self.name_resolvers.pop(key, None)
+        try:
+            if self._is_reparsed_in_place(key):
+                self.translation_units[key].reparse(
+                    TranslationUnitRegistry._build_unsaved_files(key))
+            else:
+                self.translation_units[key] = self._parse_key(key)
+        except clang.cindex.TranslationUnitLoadError as error:
+            print "Failed to reparse file '{}' with clang args '{}': {}".format(key[0], key[1],
+                                                                             error)
+            self.forget(key)
@@ -0,0 +1,153 @@
+#!/usr/bin/python
+import cPickle as pickle
+import errno
+import fcntl
+import hashlib
+import os
+import tempfile
+
+
+# On-disk cache of classes returned by ClassParser.parse().
+# Dependencies entry of a file lists files included by its translation unit. Class entry key
+# consists of file content hash, clang arguments, class pattern and content hashes of all
+# dependencies. Entries are written atomically, so directory could be shared between processes.
+class ClassCache:
+    # Changed every time format of cached classes is changed
+    _format_version = 5
+    _dependencies_suffix = ".deps"
+    _class_suffix = ".class"
+    _lock_file_name = ".lock"
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        self.file_hashes = {}
+
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError as error:
+                if error.errno != errno.EEXIST:
+                    raise
+
+    @staticmethod
+    def _hash(*values):
+        return hashlib.sha1(repr(values)).hexdigest()
+
+    def _hash_file(self, file_path):
+        file_path = os.path.abspath(file_path)
+        if file_path not in self.file_hashes:
+            try:
+                with open(file_path, "rb") as f:
+                    self.file_hashes[file_path] = hashlib.sha1(f.read()).hexdigest()
+            except IOError:
+                self.file_hashes[file_path] = None
+
+        return self.file_hashes[file_path]
+
+    def forget_file_hashes(self):
+        self.file_hashes = {}
+
+    def _build_file_key(self, file_path, clang_args):
+        return ClassCache._hash(ClassCache._format_version, self._hash_file(file_path),
+                                tuple(clang_args or []))
+
+    def _build_class_key(self, file_key, class_pattern, dependencies):
+        dependencies_hashes = [(path, self._hash_file(path)) for path in dependencies]
+        return ClassCache._hash(file_key, class_pattern, dependencies_hashes)
+
+    def _entry_path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def _read_entry(self, key, suffix):
+        path = self._entry_path(key, suffix)
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+            os.utime(path, None)
+            return result
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def _write_entry(self, key, suffix, value):
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as f:
+                pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+            os.rename(temp_path, self._entry_path(key, suffix))
+        except (IOError, OSError) as error:
+            print "Warning: Could not write cache entry '{}': {}".format(temp_path, error)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def load(self, file_path, clang_args, class_pattern):
+        if self._hash_file(file_path) is None:
+            return None
+
+        file_key = self._build_file_key(file_path, clang_args)
+        dependencies = self._read_entry(file_key, ClassCache._dependencies_suffix)
+        if dependencies is None:
+            return None
+
+        class_key = self._build_class_key(file_key, class_pattern, dependencies)
+        return self._read_entry(class_key, ClassCache._class_suffix)
+
+    # Returns file and files included by it, which classes stored for file and clang_args depend
+    # on, or None if nothing is stored
+    def get_dependencies(self, file_path, clang_args):
+        if self._hash_file(file_path) is None:
+            return None
+
+        file_key = self._build_file_key(file_path, clang_args)
+        dependencies = self._read_entry(file_key, ClassCache._dependencies_suffix)
+        if dependencies is None:
+            return None
+
+        return [os.path.abspath(file_path)] + dependencies
+
+    def store(self, file_path, clang_args, class_pattern, dependencies, _class):
+        if self._hash_file(file_path) is None:
+            return
+
+        dependencies = sorted(set(os.path.abspath(path) for path in dependencies))
+
+        file_key = self._build_file_key(file_path, clang_args)
+        class_key = self._build_class_key(file_key, class_pattern, dependencies)
+        self._write_entry(file_key, ClassCache._dependencies_suffix, dependencies)
+        self._write_entry(class_key, ClassCache._class_suffix, _class)
+
+    def _list_entries(self):
+        results = []
+        for name in os.listdir(self.directory):
+            if not name.endswith((ClassCache._dependencies_suffix, ClassCache._class_suffix)):
+                continue
+
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            results.append((stat.st_mtime, stat.st_size, path))
+
+        return results
+
+    # Removes least recently used entries until cache size fits max_size bytes
+    def evict(self):
+        with open(os.path.join(self.directory, ClassCache._lock_file_name), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                entries = self._list_entries()
+                size = sum(entry[1] for entry in entries)
+                for _, entry_size, path in sorted(entries):
+                    if size <= self.max_size:
+                        break
+
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+                    size -= entry_size
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
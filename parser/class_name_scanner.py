@@ -0,0 +1,134 @@
+#!/usr/bin/python
+import re
+
+
+# Finds full names of classes and structs defined in C++ source without parsing it by clang.
+# Names are built the same way as by FileDeclarationsParser: namespaces and outer classes
+# separated by "::". Classes inside functions, enums or extern blocks are skipped.
+# Macros aren't expanded and both branches of conditional compilation are scanned.
+class ClassNameScanner:
+    _ignored_pattern = re.compile(
+        r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|'
+        r'^[ \t]*#(?:\\\n|[^\n])*', re.DOTALL | re.MULTILINE)
+    _token_pattern = re.compile(r"[a-zA-Z_]\w*|::|\[\[|\]\]|\S")
+
+    _class_keywords = frozenset(["class", "struct"])
+    _skipped_specifiers = frozenset(["final", "alignas"])
+
+    @staticmethod
+    def _tokenize(source):
+        source = ClassNameScanner._ignored_pattern.sub(" ", source)
+        return ClassNameScanner._token_pattern.findall(source)
+
+    @staticmethod
+    def _is_identifier(token):
+        return token[0].isalpha() or token[0] == "_"
+
+    # Returns namespace names and position of its "{", or None if it is not namespace definition
+    @staticmethod
+    def _parse_namespace(tokens, pos):
+        names = []
+        while pos < len(tokens):
+            token = tokens[pos]
+            if token == "{":
+                return (names or [""]), pos
+            elif ClassNameScanner._is_identifier(token):
+                if token != "inline":
+                    names.append(token)
+            elif token != "::":
+                return None
+
+            pos += 1
+
+        return None
+
+    # Returns class name and position of its "{", or None if it is not class definition
+    @staticmethod
+    def _parse_class(tokens, pos):
+        name = None
+        angle_depth = 0
+        while pos < len(tokens):
+            token = tokens[pos]
+            if token == "[[":
+                while pos < len(tokens) and tokens[pos] != "]]":
+                    pos += 1
+            elif token == "(" and name == "alignas":
+                while pos < len(tokens) and tokens[pos] != ")":
+                    pos += 1
+            elif token == "<":
+                angle_depth += 1
+            elif token == ">" and angle_depth:
+                angle_depth -= 1
+            elif angle_depth:
+                pass
+            elif token in ["{", ":"]:
+                break
+            elif ClassNameScanner._is_identifier(token):
+                if token not in ClassNameScanner._skipped_specifiers or name is None:
+                    name = token
+            elif token != "::":
+                return None
+
+            pos += 1
+
+        if name is None or name in ClassNameScanner._skipped_specifiers:
+            return None
+
+        # skip base classes
+        while pos < len(tokens) and tokens[pos] not in ["{", ";"]:
+            pos += 1
+
+        if pos == len(tokens) or tokens[pos] != "{":
+            return None
+
+        return name, pos
+
+    # Names are joined like in FileDeclarationsParser, so anonymous namespace at top level adds
+    # nothing to full name
+    @staticmethod
+    def _join_names(names):
+        result = ""
+        for name in names:
+            result = "{}::{}".format(result, name) if result else name
+
+        return result
+
+    @staticmethod
+    def scan(source):
+        results = []
+        tokens = ClassNameScanner._tokenize(source)
+
+        # every scope is list of names which it adds to full name, or None if classes
+        # inside it aren't indexed
+        scopes = []
+        is_indexed_scope = True
+        pos = 0
+        while pos < len(tokens):
+            token = tokens[pos]
+            parsed = None
+
+            if not is_indexed_scope:
+                pass
+            elif token == "namespace":
+                parsed = ClassNameScanner._parse_namespace(tokens, pos + 1)
+            elif token in ClassNameScanner._class_keywords and (
+                    not pos or tokens[pos - 1] not in ["enum", "friend"]):
+                parsed = ClassNameScanner._parse_class(tokens, pos + 1)
+
+            if parsed:
+                names, pos = parsed
+                if token != "namespace":
+                    names = [names]
+                    results.append(ClassNameScanner._join_names(sum(scopes, []) + names))
+
+                scopes.append(names)
+            elif token == "{":
+                scopes.append(None)
+                is_indexed_scope = False
+            elif token == "}" and scopes:
+                scopes.pop()
+                is_indexed_scope = None not in scopes
+
+            pos += 1
+
+        return results
@@ -1,67 +1,119 @@
 #!/usr/bin/python
 import os
-import re
 from cindex_wrappers.file_declarations_parser import FileDeclarationsParser
 from declaration_parsers.function_declaration_parser import FunctionDeclarationParser
 from declaration_parsers.property_declaration_parser import PropertyDeclarationParser
+from models import Qualifiers
 
 
 class ClassParser:
-    def __init__(self, file_path, class_name, clang_args=None):
-        self.file_parser = FileDeclarationsParser(file_path, clang_args)
+    # Declaration info is taken from libclang types instead of source text if semantic is set.
+    # Members are filtered by detail, see Detail. Includes are skipped if skip_includes is set.
+    # Relationships to classes of fields and bases are parsed if with_relationships is set
+    def __init__(self, file_path, class_name, clang_args=None, registry=None, cache=None,
+                 semantic=False, detail=None, skip_includes=False, with_relationships=False):
+        self.file_parser = FileDeclarationsParser(file_path, clang_args, registry, skip_includes)
         self.class_name = class_name
+        self.cache = cache
+        self.semantic = semantic
+        self.detail = detail
+        self.with_relationships = with_relationships
+        # clang args could be extended by file parser, so cache key is built from initial ones
+        self.file_path = file_path
+        self.clang_args = list(clang_args or [])
 
     def _search_class_full_name(self):
-        classes_full_names = self.file_parser.parse_classes_full_names()
+        resolver = self.file_parser.build_name_resolver()
+        classes_full_names = resolver.names
         if not classes_full_names:
-            print "Error: No classes in file '{}', clang args: {}".format(file_path, clang_args)
+            print "Error: No classes in file '{}', clang args: {}".format(self.file_path,
+                                                                         self.clang_args)
             return None
 
         class_pattern = r"(.*::)?{}$".format(self.class_name)
-        matched_classes_full_names = filter(lambda full_name: re.search(class_pattern, full_name),
-                                            classes_full_names)
+        matched_classes_full_names = resolver.match_class_name(self.class_name)
         if not matched_classes_full_names:
             print("Error: No class matching pattern '{}' in file '{}', clang args '{}', "
-                  "suggested classes: {}").format(class_pattern, file_path, clang_args,
+                  "suggested classes: {}").format(class_pattern, self.file_path, self.clang_args,
                                                   classes_full_names)
             return None
 
         elif len(matched_classes_full_names) > 1:
             print "Error: In file '{}' several classes are matching pattern '{}': {}".format(
-                file_path, class_pattern, matched_classes_full_names)
+                self.file_path, class_pattern, matched_classes_full_names)
             return None
 
         return matched_classes_full_names[0]
 
+    def _cache_pattern(self):
+        result = ("semantic", self.class_name) if self.semantic else self.class_name
+        if self.detail:
+            result = ("detail", self.detail, result)
+
+        if self.with_relationships:
+            result = ("relationships", result)
+
+        if self.file_parser.skip_includes:
+            result = ("skip includes", result)
+
+        precompiled_header_path = self.file_parser.get_precompiled_header_path()
+        if precompiled_header_path:
+            result = ("precompiled header", precompiled_header_path, result)
+
+        return result
+
     def parse(self):
+        if self.cache:
+            result = self.cache.load(self.file_path, self.clang_args, self._cache_pattern())
+            if result is not None:
+                return result
+
+        result = self._parse()
+        if result and self.cache:
+            self.cache.store(self.file_path, self.clang_args, self._cache_pattern(),
+                             self.file_parser.parse_included_files(), result)
+
+        return result
+
+    def _parse(self):
         matched_full_name = self._search_class_full_name()
         if matched_full_name:
-            results = self.file_parser.parse_classes(matched_full_name)
+            results = self.file_parser.parse_classes(matched_full_name, self.semantic,
+                                                     self.detail, self.with_relationships)
 
             if len(results) == 1:
                 result = results[0]
-                result = ClassParser._extend_class_with_declaration_info(result)
+                if not self.semantic:
+                    result = ClassParser.extend_class_with_declaration_info(result)
                 return result
 
         return None
 
+    # Records parsed without declarations, see Detail, are not extended
     @staticmethod
     def _extend_properties_with_declaration_info(properties):
         for property in properties:
+            if property.declaration is None:
+                continue
+
             parsed_declaration = PropertyDeclarationParser(
-                property["declaration"], property["name"]).parse()
-            property.update(parsed_declaration)
+                property.declaration, property.name).parse()
+            property.set_declaration_info(parsed_declaration["type"],
+                                          Qualifiers.from_names(parsed_declaration["qualifiers"]))
 
         return properties
 
     @staticmethod
     def _extend_method_with_declaration_info(method):
-        qualifiers = method["qualifiers"]
-        parsed_declaration = FunctionDeclarationParser(method["declaration"]).parse()
-        method.update(parsed_declaration)
-        method["qualifiers"] = method["qualifiers"] + qualifiers
-        method["parameters"] = ClassParser._extend_properties_with_declaration_info(
-            method["parameters"])
+        if method.declaration is None:
+            return method
+
+        parsed_declaration = FunctionDeclarationParser(method.declaration).parse()
+        method.set_declaration_info(parsed_declaration["type"],
+                                    Qualifiers.from_names(parsed_declaration["qualifiers"]),
+                                    parsed_declaration.get("template_declaration"))
+        method.parameters = ClassParser._extend_properties_with_declaration_info(
+            method.parameters)
 
         return method
 
@@ -73,8 +125,8 @@ class ClassParser:
         return methods
 
     @staticmethod
-    def _extend_class_with_declaration_info(_class):
-        _class["methods"] = ClassParser._extend_methods_with_declaration_info(_class["methods"])
-        _class["fields"] = ClassParser._extend_properties_with_declaration_info(_class["fields"])
+    def extend_class_with_declaration_info(_class):
+        _class.methods = ClassParser._extend_methods_with_declaration_info(_class.methods)
+        _class.fields = ClassParser._extend_properties_with_declaration_info(_class.fields)
 
         return _class
@@ -0,0 +1,125 @@
+#!/usr/bin/python
+import json
+import os
+import shlex
+
+
+# Loads compile_commands.json and provides clang arguments for source and header files.
+# Identical arguments of different entries are stored once.
+class CompilationDatabase:
+    _path_options = ["-I", "-isystem", "-iquote", "-idirafter", "-include", "-imacros"]
+    _options_with_value = ["-o", "-MF", "-MT", "-MQ"]
+    _options_without_value = ["-c", "-M", "-MM", "-MD", "-MMD", "-MP"]
+
+    def __init__(self, file_path):
+        if os.path.isdir(file_path):
+            file_path = os.path.join(file_path, "compile_commands.json")
+
+        with open(file_path) as f:
+            entries = json.load(f)
+
+        self.shared_arguments = {}
+        self.file_arguments = {}
+        self.directory_stem_arguments = {}
+        self.directory_arguments = {}
+        self.stem_arguments = {}
+        self.merged_arguments = {}
+
+        for entry in entries:
+            directory = entry.get("directory", os.path.dirname(os.path.abspath(file_path)))
+            source_path = os.path.normpath(os.path.join(directory, entry["file"]))
+            arguments = self._share(self._parse_entry_arguments(entry, directory))
+
+            self.file_arguments[source_path] = arguments
+            directory, stem = os.path.split(os.path.splitext(source_path)[0])
+            self.directory_stem_arguments.setdefault((directory, stem), arguments)
+            self.directory_arguments.setdefault(directory, arguments)
+            self.stem_arguments.setdefault(stem, arguments)
+
+    # json module returns unicode strings, but clang bindings expect byte strings
+    @staticmethod
+    def _encode(string):
+        if isinstance(string, unicode):
+            return string.encode("utf-8")
+
+        return string
+
+    def _share(self, arguments):
+        return self.shared_arguments.setdefault(arguments, arguments)
+
+    @staticmethod
+    def _absolute_path_argument(argument, directory):
+        for option in CompilationDatabase._path_options:
+            if argument.startswith(option) and len(argument) > len(option):
+                path = argument[len(option):]
+                return option + os.path.normpath(os.path.join(directory, path))
+
+        return argument
+
+    @staticmethod
+    def _parse_entry_arguments(entry, directory):
+        if "arguments" in entry:
+            arguments = [CompilationDatabase._encode(argument) for argument in entry["arguments"]]
+        else:
+            arguments = shlex.split(CompilationDatabase._encode(entry["command"]))
+
+        directory = CompilationDatabase._encode(directory)
+        source_file = CompilationDatabase._encode(entry["file"])
+        results = []
+        skip_value = False
+        path_value = False
+        # first argument is compiler executable
+        for argument in arguments[1:]:
+            if skip_value:
+                skip_value = False
+            elif path_value:
+                path_value = False
+                results.append(os.path.normpath(os.path.join(directory, argument)))
+            elif argument in CompilationDatabase._options_with_value:
+                skip_value = True
+            elif argument in CompilationDatabase._options_without_value:
+                pass
+            elif argument.startswith("-o") or argument == source_file:
+                pass
+            elif argument in CompilationDatabase._path_options:
+                path_value = True
+                results.append(argument)
+            else:
+                results.append(CompilationDatabase._absolute_path_argument(argument, directory))
+
+        return tuple(results)
+
+    # Header files are looked up by source file with the same name in the same directory, then by
+    # any source file in the same directory and at last by source file with the same name in any
+    # directory
+    def _find_arguments(self, file_path):
+        file_path = os.path.abspath(file_path)
+        if file_path in self.file_arguments:
+            return self.file_arguments[file_path]
+
+        directory, stem = os.path.split(os.path.splitext(file_path)[0])
+        if (directory, stem) in self.directory_stem_arguments:
+            return self.directory_stem_arguments[(directory, stem)]
+
+        if directory in self.directory_arguments:
+            return self.directory_arguments[directory]
+
+        return self.stem_arguments.get(stem)
+
+    # Returns file arguments followed by clang_args. Language standard of file arguments has
+    # priority over one from clang_args. Returns None if there are no arguments for file
+    def get_arguments(self, file_path, clang_args=None):
+        file_arguments = self._find_arguments(file_path)
+        if file_arguments is None:
+            return None
+
+        clang_args = tuple(clang_args or [])
+        key = (file_arguments, clang_args)
+        if key not in self.merged_arguments:
+            if any(argument.startswith("-std=") for argument in file_arguments):
+                clang_args = tuple(argument for argument in clang_args
+                                   if not argument.startswith("-std="))
+
+            self.merged_arguments[key] = list(file_arguments + clang_args)
+
+        return self.merged_arguments[key]
@@ -1,4 +1,5 @@
 #!/usr/bin/python
+from parser.lru_dictionary import LruDictionary
 from string_with_brackets import StringWithBrackets
 import re
 
@@ -15,13 +16,95 @@ class StringRange:
 
 
 class FunctionDeclarationParser:
+    # Identifiers, keywords and numbers are single tokens, other symbols except brackets are
+    # skipped
+    _token_pattern = re.compile(r"[a-zA-Z_0-9]+|[(){}<>\[\]]")
+    _identifier_pattern = re.compile(r"(?<![a-zA-Z_0-9])[a-zA-Z_][a-zA-Z_0-9]*(?![a-zA-Z_0-9])")
+
+    _type_qualifiers = ["virtual", "static", "explicit"]
+    _method_qualifiers = [("override", "override"), ("const", "const"), ("=0", "pure"),
+                          ("=delete", "deleted"), ("=default", "default")]
+
+    # Overridden methods repeat the same declarations across hierarchies
+    parsed_declarations = LruDictionary(4096)
 
     def __init__(self, declaration):
         self.declaration = declaration
 
-    def _search_template(self):
+    # Finds template, name and qualifiers ranges in one pass over tokens of declaration. Returns
+    # None if brackets are unbalanced, e.g. in operator declarations, or parameters are not found,
+    # then ranges are searched by StringWithBrackets, which raises errors for them
+    def _lex(self):
+        open_bracket_positions = []
+        template_start = None
+        template_parameters_start = None
+        template_parameters_end = None
+        parameters_start = None
+        parameters_end = None
+        name = None
+        for token in FunctionDeclarationParser._token_pattern.finditer(self.declaration):
+            value = token.group()
+            pos = token.start()
+            if value in StringWithBrackets.open_brackets:
+                if not open_bracket_positions:
+                    if (value == "<" and template_start is not None and
+                            template_parameters_start is None):
+                        template_parameters_start = pos
+                    elif value == "(" and parameters_start is None:
+                        parameters_start = pos
+
+                open_bracket_positions.append(pos)
+            elif value in StringWithBrackets.closed_brackets:
+                if not open_bracket_positions:
+                    return None
+
+                open_pos = open_bracket_positions.pop()
+                if StringWithBrackets.brackets_dict[self.declaration[open_pos]] != value:
+                    return None
+
+                if open_pos == template_parameters_start:
+                    template_parameters_end = pos
+                elif open_pos == parameters_start:
+                    parameters_end = pos
+            else:
+                if not open_bracket_positions and template_start is None:
+                    keyword_pos = value.find("template")
+                    if keyword_pos != -1:
+                        template_start = pos + keyword_pos
+
+                # last identifier before parameters
+                if parameters_start is None and not value[0].isdigit():
+                    name = token
+
+        if open_bracket_positions or parameters_start is None:
+            return None
+
+        template_range = None
+        if template_start is not None:
+            if template_parameters_start is None:
+                raise ValueError(
+                    "Error: Could not find template parameters in method declaration '{}'".format(
+                        self.declaration))
+
+            template_range = StringRange(self.declaration, template_start,
+                                         template_parameters_end + 1)
+
+        if not name:
+            raise ValueError(
+                "Error: Could not find name in method declaration '{}'".format(
+                    self.declaration))
+
+        return (template_range, StringRange(self.declaration, name.start(), name.end()),
+                StringRange(self.declaration, parameters_end + 1, len(self.declaration)))
+
+    def _search_ranges(self):
         declaration_with_brackets = StringWithBrackets(self.declaration)
+        template_range = self._search_template(declaration_with_brackets)
+        name_range = self._search_name(declaration_with_brackets)
+        qualifiers_range = self._search_qualifiers(declaration_with_brackets)
+        return template_range, name_range, qualifiers_range
 
+    def _search_template(self, declaration_with_brackets):
         template_start = declaration_with_brackets.find_outside_brackets("template")
         if template_start == -1:
             return None
@@ -42,13 +125,12 @@ class FunctionDeclarationParser:
 
         return StringRange(self.declaration, template_start, parameters_end + 1)
 
-    def _search_name(self):
-        declaration_with_brackets = StringWithBrackets(self.declaration)
+    def _search_name(self, declaration_with_brackets):
         parameters_start = declaration_with_brackets.find_any_of_brackets('(')
         declaration_until_parameters = self.declaration[:parameters_start]
 
-        identifiers = re.finditer(r"(?<![a-zA-Z_0-9])[a-zA-Z_][a-zA-Z_0-9]*(?![a-zA-Z_0-9])",
-                                  declaration_until_parameters)
+        identifiers = FunctionDeclarationParser._identifier_pattern.finditer(
+            declaration_until_parameters)
 
         # get last identifier before parameters
         name = None
@@ -63,9 +145,7 @@ class FunctionDeclarationParser:
 
         return StringRange(self.declaration, name.start(), name.end())
 
-    def _search_type(self):
-        template_range = self._search_template()
-        name_range = self._search_name()
+    def _search_type(self, template_range, name_range):
         if not name_range:
             raise ValueError("Error: Could not match type in method declaration '{}'".format(
                 self.declaration))
@@ -75,9 +155,7 @@ class FunctionDeclarationParser:
         type_end = name_range.start - 1
         return StringRange(self.declaration, type_start, type_end)
 
-    def _search_qualifiers(self):
-        declaration_with_brackets = StringWithBrackets(self.declaration)
-
+    def _search_qualifiers(self, declaration_with_brackets):
         parameters_end = declaration_with_brackets.find_any_of_brackets(")")
         if parameters_end == -1:
             raise ValueError(
@@ -87,47 +165,56 @@ class FunctionDeclarationParser:
 
         return StringRange(self.declaration, parameters_end + 1, len(self.declaration))
 
-    def parse(self):
+    # Splits string by whitespaces. '=' is also joined with next token, so "= 0" gives "=0" too
+    @staticmethod
+    def _tokenize(string):
+        results = string.split()
+        results.extend(["=" + token for previous, token in zip(results, results[1:])
+                        if previous == "="])
+
+        return results
+
+    def _parse(self):
         result = {}
 
-        type_range = self._search_type()
-        type = type_range.value
+        ranges = self._lex()
+        if ranges is None:
+            ranges = self._search_ranges()
+
+        template_range, name_range, qualifiers_range = ranges
+        type = self._search_type(template_range, name_range).value
         type = type.strip()
         result["type"] = type
 
         qualifiers = []
 
-        template_range = self._search_template()
         if template_range:
             qualifiers.append("template")
             result["template_declaration"] = template_range.value
 
-        if re.search(r"(^|\s+)virtual(\s+|$)", type):
-            qualifiers.append("virtual")
-
-        if re.search(r"(^|\s+)static(\s+|$)", type):
-            qualifiers.append("static")
-
-        if re.search(r"(^|\s+)explicit(\s+|$)", type):
-            qualifiers.append("explicit")
+        type_tokens = type.split()
+        for qualifier in FunctionDeclarationParser._type_qualifiers:
+            if qualifier in type_tokens:
+                qualifiers.append(qualifier)
 
-        qualifiers_string = self._search_qualifiers().value
-        qualifiers_string = qualifiers_string.strip()
-        if re.search(r"(^|\s+)override(\s+|$)", qualifiers_string):
-            qualifiers.append("override")
-
-        if re.search(r"(^|\s+)const(\s+|$)", qualifiers_string):
-            qualifiers.append("const")
-
-        if re.search(r"(^|\s+)=\s*0(\s+|$)", qualifiers_string):
-            qualifiers.append("pure")
-
-        if re.search(r"(^|\s+)=\s*delete(\s+|$)", qualifiers_string):
-            qualifiers.append("deleted")
-
-        if re.search(r"(^|\s+)=\s*default(\s+|$)", qualifiers_string):
-            qualifiers.append("default")
+        qualifiers_tokens = FunctionDeclarationParser._tokenize(qualifiers_range.value)
+        for token, qualifier in FunctionDeclarationParser._method_qualifiers:
+            if token in qualifiers_tokens:
+                qualifiers.append(qualifier)
 
         result["qualifiers"] = qualifiers
 
         return result
+
+    def parse(self):
+        parsed_declarations = FunctionDeclarationParser.parsed_declarations
+        if self.declaration in parsed_declarations:
+            result = parsed_declarations.get(self.declaration)
+        else:
+            result = self._parse()
+            parsed_declarations[self.declaration] = result
+
+        # result is copied, because callers extend it
+        result = dict(result)
+        result["qualifiers"] = list(result["qualifiers"])
+        return result
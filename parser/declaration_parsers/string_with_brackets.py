@@ -1,23 +1,98 @@
 #!/usr/bin/python
+from bisect import bisect_left
+
+
 class StringWithBrackets:
+    brackets_dict = {'(': ')', '{': '}', '<': '>', '[': ']'}
+    open_brackets = frozenset(brackets_dict.keys())
+    closed_brackets = frozenset(brackets_dict.values())
+
     def __init__(self, string):
         self.string = string
-        self.brackets_dict = {'(': ')', '{': '}', '<': '>', '[': ']'}
+        self._build_index()
 
-    def find_any_of_brackets(self, brackets, bracket_rank=1, start_pos=0):
-        if bracket_rank < 1:
-            raise ValueError("Bracket rank starts from 1")
-            return -1
+    # Records positions of all brackets, depth of every bracket and position of its pair.
+    # Index is not used if string is unbalanced, so errors are raised by scanning
+    def _build_index(self):
+        self.bracket_positions = []
+        self.depths = {}
+        self.pairs = {}
+        self.is_balanced = True
 
-        if 0 > start_pos or start_pos >= len(self.string):
-            return -1
+        open_bracket_stack = []
+        for pos, sym in enumerate(self.string):
+            if sym in StringWithBrackets.open_brackets:
+                self.bracket_positions.append(pos)
+                self.depths[pos] = len(open_bracket_stack)
+                open_bracket_stack.append(pos)
+            elif sym in StringWithBrackets.closed_brackets:
+                self.bracket_positions.append(pos)
+                if not open_bracket_stack:
+                    self.is_balanced = False
+                    return
+
+                open_pos = open_bracket_stack.pop()
+                if StringWithBrackets.brackets_dict[self.string[open_pos]] != sym:
+                    self.is_balanced = False
+                    return
+
+                self.depths[pos] = len(open_bracket_stack)
+                self.pairs[pos] = open_pos
+                self.pairs[open_pos] = pos
+
+        if open_bracket_stack:
+            self.is_balanced = False
+
+    # Number of brackets opened before pos and not closed before it
+    def _depth_at(self, pos):
+        index = bisect_left(self.bracket_positions, pos)
+        if index == len(self.bracket_positions):
+            return 0
+
+        bracket_pos = self.bracket_positions[index]
+        depth = self.depths[bracket_pos]
+        if self.string[bracket_pos] in StringWithBrackets.closed_brackets:
+            depth += 1
+
+        return depth
+
+    def _find_any_of_brackets_in_index(self, brackets, bracket_rank, start_pos):
+        base_depth = self._depth_at(start_pos)
+
+        index = bisect_left(self.bracket_positions, start_pos)
+        while index < len(self.bracket_positions):
+            pos = self.bracket_positions[index]
+            sym = self.string[pos]
+            is_opened_bracket = sym in StringWithBrackets.open_brackets
+
+            # rank of open bracket is counted after it, rank of closed bracket before it
+            rank = self.depths[pos] - base_depth + 1
+
+            if rank == bracket_rank and sym in brackets:
+                return pos
+
+            if not is_opened_bracket and rank < 1:
+                raise IndexError("String '{}' is unbalanced starting from pos {}. "
+                                 "Extra back bracket '{}' at {}".format(
+                                     self.string, start_pos, sym, pos))
+                return -1
+
+            if is_opened_bracket and rank >= bracket_rank:
+                # nested brackets have greater rank, so they are skipped
+                index = bisect_left(self.bracket_positions, self.pairs[pos], index)
+            else:
+                index += 1
+
+        return -1
 
+    def _scan_any_of_brackets(self, brackets, bracket_rank, start_pos):
         rank = 0
 
         open_bracket_stack = []
-        for pos, sym in enumerate(self.string[start_pos:], start_pos):
-            is_opened_bracket = sym in self.brackets_dict.keys()
-            is_closed_bracket = sym in self.brackets_dict.values()
+        for pos in xrange(start_pos, len(self.string)):
+            sym = self.string[pos]
+            is_opened_bracket = sym in StringWithBrackets.open_brackets
+            is_closed_bracket = sym in StringWithBrackets.closed_brackets
 
             if is_opened_bracket or is_closed_bracket:
                 if is_opened_bracket:
@@ -53,12 +128,32 @@ class StringWithBrackets:
 
         return -1
 
+    def find_any_of_brackets(self, brackets, bracket_rank=1, start_pos=0):
+        if bracket_rank < 1:
+            raise ValueError("Bracket rank starts from 1")
+            return -1
+
+        if 0 > start_pos or start_pos >= len(self.string):
+            return -1
+
+        if self.is_balanced:
+            return self._find_any_of_brackets_in_index(brackets, bracket_rank, start_pos)
+
+        return self._scan_any_of_brackets(brackets, bracket_rank, start_pos)
+
+    def _find_corresponding_back_bracket(self, open_bracket_pos):
+        if self.is_balanced:
+            return self.pairs[open_bracket_pos]
+
+        corresponding_back_bracket = self.brackets_dict[self.string[open_bracket_pos]]
+        return self.find_any_of_brackets(corresponding_back_bracket, 1, open_bracket_pos)
+
     def find_outside_brackets(self, value, start=0):
         if 0 > start or start >= len(self.string):
             return -1
 
         while True:
-            end = self.find_any_of_brackets(self.brackets_dict.keys(), 1, start)
+            end = self.find_any_of_brackets(StringWithBrackets.open_brackets, 1, start)
             if end == -1:
                 break
 
@@ -66,10 +161,10 @@ class StringWithBrackets:
             if value_pos != -1:
                 return value_pos
 
-            last_open_bracket = self.string[end]
-            corresponding_back_bracket = self.brackets_dict[last_open_bracket]
-            start = self.find_any_of_brackets(corresponding_back_bracket, 1, end)
+            start = self._find_corresponding_back_bracket(end)
             if start == -1:
+                last_open_bracket = self.string[end]
+                corresponding_back_bracket = self.brackets_dict[last_open_bracket]
                 raise IndexError(
                     "Closed bracket '{}' isn't found in string '{}' starting from pos {}".format(
                         corresponding_back_bracket, self.string, start))
@@ -0,0 +1,90 @@
+#!/usr/bin/python
+from models import Qualifiers
+
+
+# Types are compared without whitespaces, since libclang spells "int&" as "int &"
+def _normalize(value):
+    if isinstance(value, basestring):
+        return "".join(value.split())
+
+    return value
+
+
+def _compare_values(description, names, text_value, semantic_value):
+    for name in names:
+        text_field_value = getattr(text_value, name)
+        semantic_field_value = getattr(semantic_value, name)
+        if _normalize(text_field_value) != _normalize(semantic_field_value):
+            if name == "qualifiers":
+                text_field_value = Qualifiers.to_names(text_field_value)
+                semantic_field_value = Qualifiers.to_names(semantic_field_value)
+
+            yield "{} {}: text {!r}, semantic {!r}".format(description, name, text_field_value,
+                                                          semantic_field_value)
+
+
+def _compare_lists(description, text_values, semantic_values):
+    if len(text_values) != len(semantic_values):
+        yield "{} count: text {}, semantic {}".format(description, len(text_values),
+                                                       len(semantic_values))
+
+
+def _compare_method(description, text_method, semantic_method):
+    names = ["name", "qualifiers", "template_declaration"]
+    if not text_method.qualifiers & (Qualifiers.CONSTRUCTOR | Qualifiers.DESTRUCTOR):
+        names.append("type")
+
+    for difference in _compare_values(description, names, text_method, semantic_method):
+        yield difference
+
+    text_parameters = text_method.parameters
+    semantic_parameters = semantic_method.parameters
+    for difference in _compare_lists(description + " parameters", text_parameters,
+                                     semantic_parameters):
+        yield difference
+
+    for n, (text_parameter, semantic_parameter) in enumerate(zip(text_parameters,
+                                                                 semantic_parameters)):
+        for difference in _compare_values("{} parameter {}".format(description, n),
+                                          ["name", "type", "qualifiers"], text_parameter,
+                                          semantic_parameter):
+            yield difference
+
+
+def _compare_class(text_class, semantic_class):
+    full_name = text_class.full_name
+
+    for name, member_type in [("methods", "method"), ("fields", "field")]:
+        text_members = getattr(text_class, name)
+        semantic_members = getattr(semantic_class, name)
+        for difference in _compare_lists("class '{}' {}".format(full_name, name), text_members,
+                                         semantic_members):
+            yield difference
+
+        # members are listed in the same order by both extractions
+        for text_member, semantic_member in zip(text_members, semantic_members):
+            description = "{} '{}::{}'".format(member_type, full_name, text_member.name)
+            if member_type == "method":
+                differences = _compare_method(description, text_member, semantic_member)
+            else:
+                differences = _compare_values(description, ["name", "type", "qualifiers"],
+                                              text_member, semantic_member)
+
+            for difference in differences:
+                yield difference
+
+
+# Yields descriptions of differences between classes parsed from source text and from libclang
+# types. Declarations are not compared, since semantic extraction doesn't read them
+def compare_classes(text_classes, semantic_classes):
+    for difference in _compare_lists("classes", text_classes, semantic_classes):
+        yield difference
+
+    for text_class, semantic_class in zip(text_classes, semantic_classes):
+        if text_class.full_name != semantic_class.full_name:
+            yield "class full name: text '{}', semantic '{}'".format(text_class.full_name,
+                                                                     semantic_class.full_name)
+            continue
+
+        for difference in _compare_class(text_class, semantic_class):
+            yield difference
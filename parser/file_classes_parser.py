@@ -0,0 +1,172 @@
+#!/usr/bin/python
+import glob
+import os
+import re
+import sys
+from cindex_wrappers.file_declarations_parser import FileDeclarationsParser
+from class_parser import ClassParser
+from name_resolver import NameResolver
+from extraction_comparison import compare_classes
+
+
+class FileClassesParser:
+    header_extensions = [".h", ".hh", ".hpp", ".hxx", ".h++"]
+
+    def __init__(self, file_path, include_pattern=None, exclude_pattern=None, clang_args=None,
+                 registry=None, cache=None, semantic=False, detail=None, skip_includes=False,
+                 with_relationships=False):
+        self.file_parser = FileDeclarationsParser(file_path, clang_args, registry, skip_includes)
+        self.include_pattern = include_pattern
+        self.exclude_pattern = exclude_pattern
+        self.cache = cache
+        self.semantic = semantic
+        self.detail = detail
+        self.with_relationships = with_relationships
+        # clang args could be extended by file parser, so cache key is built from initial ones
+        self.file_path = file_path
+        self.clang_args = list(clang_args or [])
+
+    # path could be file, directory, which is searched recursively for headers, or glob pattern
+    @staticmethod
+    def find_files(path):
+        if os.path.isfile(path):
+            return [path]
+
+        if os.path.isdir(path):
+            results = []
+            for directory, directories, files in os.walk(path):
+                directories.sort()
+                for file in sorted(files):
+                    if os.path.splitext(file)[1] in FileClassesParser.header_extensions:
+                        results.append(os.path.join(directory, file))
+
+            return results
+
+        results = sorted(filter(os.path.isfile, glob.glob(path)))
+        if not results:
+            print "Error: No files matching path '{}'".format(path)
+
+        return results
+
+    def _is_matching(self, full_name):
+        if self.include_pattern and not re.search(self.include_pattern, full_name):
+            return False
+
+        if self.exclude_pattern and re.search(self.exclude_pattern, full_name):
+            return False
+
+        return True
+
+    # Returns predicate which is False for full name prefix if no class whose full name starts
+    # with it could match patterns, or None if patterns could match any class
+    def _build_prefix_predicate(self):
+        include_literal = None
+        if self.include_pattern:
+            include_literal = NameResolver.get_anchored_literal(self.include_pattern)
+
+        # every name containing exclude literal or starting with exclude anchored literal is
+        # excluded
+        exclude_literal = None
+        exclude_anchored_literal = None
+        exclude_pattern = self.exclude_pattern or ""
+        if exclude_pattern and NameResolver.is_literal(exclude_pattern):
+            exclude_literal = exclude_pattern
+        elif exclude_pattern.startswith("^") and NameResolver.is_literal(exclude_pattern[1:]):
+            exclude_anchored_literal = exclude_pattern[1:]
+
+        if (include_literal, exclude_literal, exclude_anchored_literal) == (None, None, None):
+            return None
+
+        def is_prefix_matching(prefix):
+            if include_literal is not None and not (prefix.startswith(include_literal) or
+                                                    include_literal.startswith(prefix)):
+                return False
+
+            if exclude_literal is not None and exclude_literal in prefix:
+                return False
+
+            if exclude_anchored_literal is not None and prefix.startswith(
+                    exclude_anchored_literal):
+                return False
+
+            return True
+
+        return is_prefix_matching
+
+    def _cache_pattern(self):
+        result = (self.include_pattern, self.exclude_pattern)
+        if self.semantic:
+            result = ("semantic",) + result
+
+        if self.detail:
+            result = ("detail", self.detail, result)
+
+        if self.with_relationships:
+            result = ("relationships", result)
+
+        if self.file_parser.skip_includes:
+            result = ("skip includes", result)
+
+        precompiled_header_path = self.file_parser.get_precompiled_header_path()
+        if precompiled_header_path:
+            result = ("precompiled header", precompiled_header_path, result)
+
+        return result
+
+    def parse(self):
+        if self.cache:
+            results = self.cache.load(self.file_path, self.clang_args, self._cache_pattern())
+            if results is not None:
+                return results
+
+        results = self.file_parser.parse_matching_classes(self._is_matching, self.semantic,
+                                                          self._build_prefix_predicate(),
+                                                          self.detail, self.with_relationships)
+        if not self.semantic:
+            results = [ClassParser.extend_class_with_declaration_info(result)
+                       for result in results]
+
+        if self.cache and self.file_parser.translation_unit is not None:
+            self.cache.store(self.file_path, self.clang_args, self._cache_pattern(),
+                             self.file_parser.parse_included_files(), results)
+
+        return results
+
+
+def _parse_selected_classes(file_path, selector, clang_args, registry, cache, semantic, detail,
+                            skip_includes, with_relationships):
+    if isinstance(selector, tuple):
+        include_pattern, exclude_pattern = selector
+        return FileClassesParser(file_path, include_pattern, exclude_pattern, clang_args,
+                                 registry, cache, semantic, detail, skip_includes,
+                                 with_relationships).parse()
+
+    result = ClassParser(file_path, selector, clang_args, registry, cache, semantic,
+                         detail, skip_includes, with_relationships).parse()
+    return [result] if result else []
+
+
+# selector is either class pattern or tuple of include and exclude patterns.
+# extraction is one of "text", "semantic" or "compare". With "compare" classes are parsed both
+# ways, differences are printed to stderr and classes parsed from text are returned.
+# Members are filtered by detail, see Detail. Includes are not parsed if skip_includes is set, see
+# FileDeclarationsParser. Relationships to classes of fields and bases are parsed if
+# with_relationships is set
+def parse_selected_classes(file_path, selector, clang_args=None, registry=None, cache=None,
+                           extraction="text", detail=None, skip_includes=False,
+                           with_relationships=False):
+    if extraction != "compare":
+        return _parse_selected_classes(file_path, selector, clang_args, registry, cache,
+                                       extraction == "semantic", detail, skip_includes,
+                                       with_relationships)
+
+    results = _parse_selected_classes(file_path, selector, clang_args, registry, cache, False,
+                                      detail, skip_includes, with_relationships)
+    semantic_results = _parse_selected_classes(file_path, selector, clang_args, registry,
+                                               cache, True, detail, skip_includes,
+                                               with_relationships)
+    for difference in compare_classes(results, semantic_results):
+        print >> sys.stderr, "Semantic extraction difference in file '{}': {}".format(
+            file_path, difference)
+
+    return results
@@ -0,0 +1,33 @@
+#!/usr/bin/python
+from collections import OrderedDict
+
+
+# Dictionary whose items are ordered by their last use, least recently used items are removed
+# when there are more than max_size of them. Items are used by get() and by setting them, but not
+# by item access, which OrderedDict does itself while items are iterated
+class LruDictionary(OrderedDict):
+    def __init__(self, max_size):
+        OrderedDict.__init__(self)
+        self.max_size = max_size
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+
+        value = dict.__getitem__(self, key)
+        del self[key]
+        OrderedDict.__setitem__(self, key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self:
+            del self[key]
+
+        OrderedDict.__setitem__(self, key, value)
+        while len(self) > self.max_size:
+            del self[next(iter(self))]
+
+    def copy(self):
+        result = LruDictionary(self.max_size)
+        result.update(self)
+        return result
@@ -0,0 +1,154 @@
+#!/usr/bin/python
+from collections import namedtuple
+
+
+# Types, names and access specifiers repeat across members, so one copy of each is kept
+def intern_string(value):
+    if isinstance(value, str):
+        return intern(value)
+
+    return value
+
+
+# Qualifiers of methods, fields and parameters are stored as bit flags
+class Qualifiers:
+    TEMPLATE = 1 << 0
+    VIRTUAL = 1 << 1
+    STATIC = 1 << 2
+    EXPLICIT = 1 << 3
+    OVERRIDE = 1 << 4
+    CONST = 1 << 5
+    PURE = 1 << 6
+    DELETED = 1 << 7
+    DEFAULT = 1 << 8
+    CONSTRUCTOR = 1 << 9
+    DESTRUCTOR = 1 << 10
+    MUTABLE = 1 << 11
+
+    names = [("template", TEMPLATE), ("virtual", VIRTUAL), ("static", STATIC),
+             ("explicit", EXPLICIT), ("override", OVERRIDE), ("const", CONST), ("pure", PURE),
+             ("deleted", DELETED), ("default", DEFAULT), ("constructor", CONSTRUCTOR),
+             ("destructor", DESTRUCTOR), ("mutable", MUTABLE)]
+    flags = dict(names)
+
+    @staticmethod
+    def from_names(names):
+        result = 0
+        for name in names:
+            result |= Qualifiers.flags[name]
+
+        return result
+
+    @staticmethod
+    def to_names(qualifiers):
+        return [name for name, flag in Qualifiers.names if qualifiers & flag]
+
+
+# Records keep their fields in slots. Strings of fields listed in _interned are interned,
+# also when records are unpickled
+class _Record(object):
+    __slots__ = ()
+    _interned = ()
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            if name in self._interned:
+                value = intern_string(value)
+
+            setattr(self, name, value)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.__getstate__() == other.__getstate__()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, ", ".join(
+            "{}={!r}".format(name, getattr(self, name)) for name in self.__slots__))
+
+
+# declaration is source text of declaration, it is dropped when type is parsed from it
+class Parameter(_Record):
+    __slots__ = ("name", "type", "qualifiers", "declaration")
+    _interned = ("name", "type")
+
+    def __init__(self, name, type=None, qualifiers=0, declaration=None):
+        self.name = intern_string(name)
+        self.type = intern_string(type)
+        self.qualifiers = qualifiers
+        self.declaration = declaration
+
+    def set_declaration_info(self, type, qualifiers):
+        self.type = intern_string(type)
+        self.qualifiers |= qualifiers
+        self.declaration = None
+
+
+class Field(_Record):
+    __slots__ = ("name", "type", "access_specifier", "qualifiers", "declaration")
+    _interned = ("name", "type", "access_specifier")
+
+    def __init__(self, name, access_specifier, type=None, qualifiers=0, declaration=None):
+        self.name = intern_string(name)
+        self.access_specifier = intern_string(access_specifier)
+        self.type = intern_string(type)
+        self.qualifiers = qualifiers
+        self.declaration = declaration
+
+    def set_declaration_info(self, type, qualifiers):
+        self.type = intern_string(type)
+        self.qualifiers |= qualifiers
+        self.declaration = None
+
+
+class Method(_Record):
+    __slots__ = ("name", "type", "access_specifier", "qualifiers", "parameters",
+                 "template_declaration", "declaration")
+    _interned = ("name", "type", "access_specifier", "template_declaration")
+
+    def __init__(self, name, access_specifier, parameters, type=None, qualifiers=0,
+                 template_declaration=None, declaration=None):
+        self.name = intern_string(name)
+        self.access_specifier = intern_string(access_specifier)
+        self.parameters = parameters
+        self.type = intern_string(type)
+        self.qualifiers = qualifiers
+        self.template_declaration = intern_string(template_declaration)
+        self.declaration = declaration
+
+    def set_declaration_info(self, type, qualifiers, template_declaration=None):
+        self.type = intern_string(type)
+        self.qualifiers |= qualifiers
+        self.template_declaration = intern_string(template_declaration)
+        self.declaration = None
+
+
+Relationship = namedtuple("Relationship", ["type", "dependee"])
+
+# Level of detail of parsed members. level is "full", "public", which keeps only public members,
+# or "names", which keeps only names of members. Members above max_members of each kind are
+# only counted, if max_members is not None
+Detail = namedtuple("Detail", ["level", "max_members"])
+
+
+# Members skipped because of max_members of Detail are counted in hidden counts
+class Class(_Record):
+    __slots__ = ("namespace", "name", "full_name", "declaration", "methods", "fields",
+                 "relationships", "hidden_methods_count", "hidden_fields_count")
+    _interned = ("namespace", "name", "full_name")
+
+    def __init__(self, namespace, name, full_name, declaration, methods, fields, relationships,
+                 hidden_methods_count=0, hidden_fields_count=0):
+        self.namespace = intern_string(namespace)
+        self.name = intern_string(name)
+        self.full_name = intern_string(full_name)
+        self.declaration = declaration
+        self.methods = methods
+        self.fields = fields
+        self.relationships = relationships
+        self.hidden_methods_count = hidden_methods_count
+        self.hidden_fields_count = hidden_fields_count
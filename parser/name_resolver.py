@@ -0,0 +1,101 @@
+#!/usr/bin/python
+import re
+from bisect import bisect_right
+
+
+# Matches class full names against patterns with the same results as
+# [name for name in names if re.search(pattern, name)], but every pattern is compiled and
+# matched once. Patterns without special characters are searched in all names by str.find.
+class NameResolver:
+    _special_characters = frozenset(".^$*+?{}[]\\|()\n")
+
+    def __init__(self, names):
+        self.names = list(names)
+
+        # every name is followed by new line, so names could be searched at once
+        self.joined_names = "".join(name + "\n" for name in self.names)
+        self.name_starts = []
+        position = 0
+        for name in self.names:
+            self.name_starts.append(position)
+            position += len(name) + 1
+
+        self.matches = {}
+
+    @staticmethod
+    def is_literal(pattern):
+        return not NameResolver._special_characters.intersection(pattern)
+
+    # Returns literal which every name matching pattern starts with, if pattern is anchored
+    # "^literal..." without alternatives, otherwise None
+    @staticmethod
+    def get_anchored_literal(pattern):
+        if not pattern.startswith("^") or "|" in pattern:
+            return None
+
+        end = 1
+        while end < len(pattern) and pattern[end] not in NameResolver._special_characters:
+            end += 1
+
+        literal = pattern[1:end]
+        # last character could be repeated zero times
+        if end < len(pattern) and pattern[end] in "?*{":
+            literal = literal[:-1]
+
+        return literal
+
+    # Names containing literal or ending with it if it is suffix
+    def _match_literal(self, literal, is_suffix=False):
+        if not literal and not is_suffix:
+            return list(self.names)
+
+        value = literal + "\n" if is_suffix else literal
+
+        results = []
+        position = self.joined_names.find(value)
+        while position != -1:
+            index = bisect_right(self.name_starts, position) - 1
+            results.append(self.names[index])
+
+            next_index = index + 1
+            if next_index == len(self.names):
+                break
+
+            position = self.joined_names.find(value, self.name_starts[next_index])
+
+        return results
+
+    # Matches all patterns with one pass over names
+    def match_all(self, patterns):
+        compiled_patterns = []
+        for pattern in set(patterns):
+            if pattern in self.matches:
+                continue
+
+            if NameResolver.is_literal(pattern):
+                self.matches[pattern] = self._match_literal(pattern)
+            else:
+                self.matches[pattern] = []
+                compiled_patterns.append((pattern, re.compile(pattern)))
+
+        if compiled_patterns:
+            for name in self.names:
+                for pattern, compiled_pattern in compiled_patterns:
+                    if compiled_pattern.search(name):
+                        self.matches[pattern].append(name)
+
+        return [self.matches[pattern] for pattern in patterns]
+
+    def match(self, pattern):
+        return self.match_all([pattern])[0]
+
+    # Same as match(r"(.*::)?{}$".format(class_name))
+    def match_class_name(self, class_name):
+        if NameResolver.is_literal(class_name):
+            key = (class_name,)
+            if key not in self.matches:
+                self.matches[key] = self._match_literal(class_name, True)
+
+            return self.matches[key]
+
+        return self.match(r"(.*::)?{}$".format(class_name))
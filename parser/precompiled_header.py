@@ -0,0 +1,205 @@
+#!/usr/bin/python
+import atexit
+import clang.cindex
+import errno
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+
+# Header shared by parsed files, e.g. including STL and Qt, is precompiled once for every set of
+# clang arguments and included by "-include-pch" to every parsed file. Manifest of every
+# precompiled header keeps modification time, size and content hash of the header and of all
+# files included by it. Precompiled header is rebuilt if any of them changed, its file name
+# contains hash of their contents. Header which is already precompiled, with ".pch" extension,
+# is used as is. Precompiled headers are kept in directory, temporary one if it is not given,
+# which is removed at exit. Manifests are pickled with precompiled header, so worker processes
+# use headers built by parent process.
+class PrecompiledHeader:
+    # Changed every time format of manifest is changed
+    _format_version = 1
+    _precompiled_extension = ".pch"
+    _manifest_suffix = ".json"
+    # CXTranslationUnit_ForSerialization isn't declared by Python bindings
+    _parse_for_serialization = 0x10
+
+    # Temporary directory is created at once, so it is shared with worker processes. It is
+    # removed at exit of process which created it, also if it is stopped by SIGTERM, see main
+    def __init__(self, path, directory=None):
+        self.path = os.path.abspath(path)
+        self.directory = directory
+        self.temporary_directory = None
+        self.owner_pid = os.getpid()
+        if directory is None and not self.path.endswith(PrecompiledHeader._precompiled_extension):
+            self.temporary_directory = tempfile.mkdtemp(prefix="class_diagram_pch_")
+            self.directory = self.temporary_directory
+            atexit.register(self.remove_temporary_directory)
+
+        # manifest of every clang args
+        self.manifests = {}
+
+    def _get_directory(self):
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError as error:
+                if error.errno != errno.EEXIST:
+                    raise
+
+        return self.directory
+
+    # Worker processes don't remove temporary directory of parent process
+    def remove_temporary_directory(self):
+        if self.temporary_directory is not None and os.getpid() == self.owner_pid:
+            shutil.rmtree(self.temporary_directory, ignore_errors=True)
+
+    @staticmethod
+    def _hash(*values):
+        return hashlib.sha1(repr(values)).hexdigest()
+
+    @staticmethod
+    def _build_file_entry(file_path):
+        try:
+            stat = os.stat(file_path)
+            with open(file_path, "rb") as f:
+                content_hash = hashlib.sha1(f.read()).hexdigest()
+        except (IOError, OSError):
+            return None
+
+        return [file_path, stat.st_mtime, stat.st_size, content_hash]
+
+    @staticmethod
+    def _is_file_entry_valid(entry):
+        file_path, modification_time, size, content_hash = entry
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+
+        if (stat.st_mtime, stat.st_size) == (modification_time, size):
+            return True
+
+        current_entry = PrecompiledHeader._build_file_entry(file_path)
+        return current_entry is not None and current_entry[3] == content_hash
+
+    @staticmethod
+    def _is_manifest_valid(manifest):
+        return (manifest is not None and
+                manifest.get("version") == PrecompiledHeader._format_version and
+                os.path.isfile(manifest["precompiled_header"]) and
+                all(PrecompiledHeader._is_file_entry_valid(entry)
+                    for entry in manifest["files"]))
+
+    def _build_path(self, clang_args):
+        name = os.path.splitext(os.path.basename(self.path))[0]
+        return os.path.join(self._get_directory(), "{}-{}".format(
+            name, PrecompiledHeader._hash(self.path, clang_args)[:16]))
+
+    @staticmethod
+    def _load_manifest(manifest_path):
+        try:
+            with open(manifest_path) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_atomically(file_path, write):
+        descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), suffix=".tmp")
+        os.close(descriptor)
+        try:
+            write(temp_path)
+            os.rename(temp_path, file_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    # Returns manifest of built precompiled header or None if it could not be built
+    def _build(self, clang_args, path):
+        try:
+            translation_unit = clang.cindex.Index.create().parse(
+                self.path, args=list(clang_args),
+                options=(clang.cindex.TranslationUnit.PARSE_INCOMPLETE |
+                         PrecompiledHeader._parse_for_serialization))
+        except clang.cindex.TranslationUnitLoadError as error:
+            print "Warning: Could not parse header '{}' with clang args '{}': {}".format(
+                self.path, clang_args, error)
+            return None
+
+        # Include paths could contain ".." after symbolic links, so they are not normalized
+        file_paths = [self.path]
+        file_paths.extend(os.path.realpath(inclusion.include.name)
+                          for inclusion in translation_unit.get_includes())
+        entries = [PrecompiledHeader._build_file_entry(file_path)
+                   for file_path in sorted(set(file_paths))]
+        if None in entries:
+            print "Warning: Could not read files included by header '{}'".format(self.path)
+            return None
+
+        manifest = {"version": PrecompiledHeader._format_version, "files": entries}
+        manifest["precompiled_header"] = "{}-{}{}".format(
+            path, PrecompiledHeader._hash([entry[3] for entry in entries])[:16],
+            PrecompiledHeader._precompiled_extension)
+
+        def write_manifest(temp_path):
+            with open(temp_path, "w") as f:
+                json.dump(manifest, f)
+
+        try:
+            PrecompiledHeader._write_atomically(manifest["precompiled_header"],
+                                                translation_unit.save)
+            PrecompiledHeader._write_atomically(path + PrecompiledHeader._manifest_suffix,
+                                                write_manifest)
+        except (IOError, OSError, clang.cindex.TranslationUnitSaveError) as error:
+            print "Warning: Could not save precompiled header '{}': {}".format(
+                manifest["precompiled_header"], error)
+            return None
+
+        return manifest
+
+    # Returns valid manifest of precompiled header built for clang args, it is rebuilt if needed.
+    # Precompiled header which is replaced is removed. Header which could not be built is not
+    # built again
+    def _get_manifest(self, clang_args):
+        if clang_args in self.manifests:
+            manifest = self.manifests[clang_args]
+            if manifest is None or PrecompiledHeader._is_manifest_valid(manifest):
+                return manifest
+
+        path = self._build_path(clang_args)
+        manifest = PrecompiledHeader._load_manifest(path + PrecompiledHeader._manifest_suffix)
+        if not PrecompiledHeader._is_manifest_valid(manifest):
+            previous_file_path = manifest and manifest.get("precompiled_header")
+            manifest = self._build(clang_args, path)
+            if (manifest is not None and previous_file_path and
+                    previous_file_path != manifest["precompiled_header"]):
+                try:
+                    os.remove(previous_file_path)
+                except OSError:
+                    pass
+
+        self.manifests[clang_args] = manifest
+        return manifest
+
+    # Returns clang args with precompiled header built for them or clang args themselves if it
+    # could not be built
+    def extend_clang_args(self, clang_args):
+        clang_args = tuple(clang_args)
+        if self.path.endswith(PrecompiledHeader._precompiled_extension):
+            return clang_args + ("-include-pch", self.path)
+
+        manifest = self._get_manifest(clang_args)
+        if manifest is None:
+            return clang_args
+
+        return clang_args + ("-include-pch", str(manifest["precompiled_header"]))
+
+    # Returns header and files included by it, which precompiled header for clang args depends on
+    def get_files(self, clang_args):
+        manifest = self.manifests.get(tuple(clang_args))
+        if manifest is None:
+            return []
+
+        return [str(entry[0]) for entry in manifest["files"]]
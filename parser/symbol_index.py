@@ -0,0 +1,124 @@
+#!/usr/bin/python
+import errno
+import hashlib
+import marshal
+import os
+import tempfile
+from class_name_scanner import ClassNameScanner
+from file_classes_parser import FileClassesParser
+from name_resolver import NameResolver
+
+
+# On-disk index of class full names defined in headers of source trees, so class could be
+# found without parsing every header by clang. Entry of every file keeps its modification time,
+# size, content hash and full names of classes. File is rescanned only if its modification time
+# or size changed and its content hash differs. Index is stored by marshal, so it loads fast.
+class SymbolIndex:
+    # Changed every time format of index or scanning of class names is changed
+    _format_version = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+        self.class_files = {}
+        self.resolver = None
+        self.load()
+
+    def load(self):
+        self.files = {}
+        self.resolver = None
+        try:
+            with open(self.path, "rb") as f:
+                version, files = marshal.load(f)
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return
+
+        if version == SymbolIndex._format_version:
+            self.files = files
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError as error:
+                if error.errno != errno.EEXIST:
+                    raise
+
+        descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as f:
+                marshal.dump((SymbolIndex._format_version, self.files), f)
+            os.rename(temp_path, self.path)
+        except (IOError, OSError) as error:
+            print "Warning: Could not write symbol index '{}': {}".format(self.path, error)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    # Returns True if entry of file was added or changed
+    def _update_file(self, file_path):
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+
+        entry = self.files.get(file_path)
+        if entry is not None and entry[:2] == (stat.st_mtime, stat.st_size):
+            return False
+
+        try:
+            with open(file_path, "rb") as f:
+                content = f.read()
+        except IOError as error:
+            print "Warning: Could not read file '{}': {}".format(file_path, error)
+            return False
+
+        content_hash = hashlib.sha1(content).hexdigest()
+        if entry is not None and entry[2] == content_hash:
+            self.files[file_path] = (stat.st_mtime, stat.st_size, content_hash, entry[3])
+            return False
+
+        class_names = tuple(ClassNameScanner.scan(content))
+        self.files[file_path] = (stat.st_mtime, stat.st_size, content_hash, class_names)
+        return True
+
+    # Scans headers found in path, see FileClassesParser.find_files. Entries of files which
+    # were removed from directory are removed. Returns number of rescanned files
+    def update(self, path):
+        file_paths = set(os.path.abspath(file_path)
+                         for file_path in FileClassesParser.find_files(path))
+
+        if os.path.isdir(path):
+            directory = os.path.join(os.path.abspath(path), "")
+            for file_path in self.files.keys():
+                if file_path.startswith(directory) and file_path not in file_paths:
+                    del self.files[file_path]
+
+        result = 0
+        for file_path in sorted(file_paths):
+            if self._update_file(file_path):
+                result += 1
+
+        self.resolver = None
+        return result
+
+    def _build_resolver(self):
+        if self.resolver is None:
+            self.class_files = {}
+            for file_path in sorted(self.files):
+                for full_name in self.files[file_path][3]:
+                    self.class_files.setdefault(full_name, []).append(file_path)
+
+            self.resolver = NameResolver(sorted(self.class_files))
+
+        return self.resolver
+
+    # Returns files defining classes which match class pattern the same way as in ClassParser
+    def find_class_files(self, class_pattern):
+        results = []
+        for full_name in self._build_resolver().match_class_name(class_pattern):
+            for file_path in self.class_files[full_name]:
+                if file_path not in results:
+                    results.append(file_path)
+
+        return results
@@ -0,0 +1,182 @@
+#!/usr/bin/python
+import multiprocessing
+import os
+import subprocess
+import sys
+from collections import Counter, OrderedDict
+from dot_utils import build_edges, get_node_relationships, print_graph_size
+from dot_utils import write_partitions_graph
+from watch_utils import open_file_atomically
+
+_index_header = ('digraph "Class Diagram Index"\n'
+                 '{\n'
+                 '\tbgcolor = transparent;\n'
+                 '\trankdir = LR;\n'
+                 '\tedge [fontname = Helvetica, fontsize = 10];\n'
+                 '\tnode [fontname = Helvetica, fontsize = 10, shape = box, style = filled, '
+                 'fillcolor = grey75, fontcolor = black ];\n'
+                 '\n')
+
+_index_footer = '}\n'
+
+
+def _partition_by_namespace(node_dictionaries, edges):
+    partitions = OrderedDict()
+    for dictionary in node_dictionaries:
+        partitions.setdefault(dictionary["namespace"], []).append(dictionary)
+
+    return [(namespace or "::", partition_node_dictionaries)
+            for namespace, partition_node_dictionaries in partitions.iteritems()]
+
+
+# Components are labeled by their first class
+def _partition_by_component(node_dictionaries, edges):
+    parents = dict((dictionary["name"], dictionary["name"]) for dictionary in node_dictionaries)
+
+    def find_root(name):
+        while parents[name] != name:
+            parents[name] = parents[parents[name]]
+            name = parents[name]
+
+        return name
+
+    for depender, dependee, _ in edges:
+        parents[find_root(depender)] = find_root(dependee)
+
+    partitions = OrderedDict()
+    for dictionary in node_dictionaries:
+        partitions.setdefault(find_root(dictionary["name"]), []).append(dictionary)
+
+    return [(partition_node_dictionaries[0]["name"], partition_node_dictionaries)
+            for partition_node_dictionaries in partitions.itervalues()]
+
+
+# Returns list of (label, node dictionaries) of every partition, in order of first nodes
+def partition_nodes(node_dictionaries, edges, mode):
+    if mode == "namespace":
+        return _partition_by_namespace(node_dictionaries, edges)
+
+    return _partition_by_component(node_dictionaries, edges)
+
+
+# Returns list of edges inside every partition and counter of edges between partitions pairs
+def _split_edges(partitions, edges):
+    node_partitions = {}
+    for n, (_, node_dictionaries) in enumerate(partitions):
+        for dictionary in node_dictionaries:
+            node_partitions[dictionary["name"]] = n
+
+    partitions_edges = [[] for _ in partitions]
+    crossing_edges = Counter()
+    for edge in edges:
+        depender_partition = node_partitions[edge[0]]
+        dependee_partition = node_partitions[edge[1]]
+        if depender_partition == dependee_partition:
+            partitions_edges[depender_partition].append(edge)
+        else:
+            crossing_edges[(depender_partition, dependee_partition)] += 1
+
+    return partitions_edges, crossing_edges
+
+
+def _build_partition_file_path(output_file_path, n, extension=None):
+    root, output_extension = os.path.splitext(output_file_path)
+    return "{}.{}{}".format(root, n, extension or output_extension or ".dot")
+
+
+# Index is graph where every partition is node linked to its file and edges between partitions
+# are labeled with count of relationships between their classes
+def _write_index(stream, partitions, crossing_edges, partition_file_paths):
+    stream.write(_index_header)
+    for n, ((label, node_dictionaries), file_path) in enumerate(zip(partitions,
+                                                                    partition_file_paths)):
+        stream.write('\t"{}" [label = "{}\\n{} classes", URL = "{}"];\n'.format(
+            n, label, len(node_dictionaries), os.path.basename(file_path)))
+
+    for (depender_partition, dependee_partition), count in sorted(crossing_edges.iteritems()):
+        stream.write('\t"{}" -> "{}" [label = "{}"];\n'.format(depender_partition,
+                                                              dependee_partition, count))
+    stream.write(_index_footer)
+
+
+# Returns error description or None
+def _render_file(task):
+    file_path, output_format = task
+    output_file_path = "{}.{}".format(os.path.splitext(file_path)[0], output_format)
+    try:
+        subprocess.check_call(["dot", "-T" + output_format, file_path, "-o", output_file_path])
+    except (OSError, subprocess.CalledProcessError) as error:
+        return "Error: Could not run graphviz dot on file '{}': {}".format(file_path, error)
+
+    return None
+
+
+# Runs graphviz dot on every file in worker processes. Returns True if all files are rendered
+def render_files(file_paths, output_format, jobs=1):
+    # Biggest files go first to keep workers busy till the end
+    tasks = [(file_path, output_format)
+             for file_path in sorted(file_paths, key=os.path.getsize, reverse=True)]
+
+    pool = multiprocessing.Pool(max(jobs, 1))
+    try:
+        errors = [error for error in pool.imap_unordered(_render_file, tasks) if error]
+    finally:
+        pool.terminate()
+        pool.join()
+
+    for error in errors:
+        print error
+
+    return not errors
+
+
+# Splits graph into partitions, see partition_nodes. Partitions are either drawn as clusters of
+# one graph written to output_file_path or printed, or written to their own files next to
+# output_file_path, which gets index of partitions. Files are rendered to render_format if it
+# is set. Relationships between partitions are drawn only in index. Sizes of graphs are printed
+# if print_size is set. Returns exit code
+def write_partitioned_graph(output_file_path, args_list, node_dictionaries, mode,
+                            clusters=False, render_format=None, jobs=1, print_size=False):
+    node_names = [dictionary["name"] for dictionary in node_dictionaries]
+    node_relationships = [relationship for dictionary in node_dictionaries
+                          for relationship in get_node_relationships(dictionary)]
+    edges = build_edges(args_list, node_names, node_relationships)
+    partitions = partition_nodes(node_dictionaries, edges, mode)
+
+    if clusters:
+        if not output_file_path:
+            size = write_partitions_graph(sys.stdout, partitions, edges, True)
+            print
+            if print_size:
+                print_graph_size(output_file_path, size)
+            return 0
+
+        with open_file_atomically(output_file_path) as stream:
+            size = write_partitions_graph(stream, partitions, edges, True)
+            stream.write("\n")
+        if print_size:
+            print_graph_size(output_file_path, size)
+        file_paths = [output_file_path]
+    else:
+        partitions_edges, crossing_edges = _split_edges(partitions, edges)
+        file_paths = []
+        for n, (partition, partition_edges) in enumerate(zip(partitions, partitions_edges)):
+            file_path = _build_partition_file_path(output_file_path, n)
+            with open_file_atomically(file_path) as stream:
+                size = write_partitions_graph(stream, [partition], partition_edges)
+                stream.write("\n")
+            if print_size:
+                print_graph_size(file_path, size)
+            file_paths.append(file_path)
+
+        link_extension = "." + render_format if render_format else None
+        with open_file_atomically(output_file_path) as stream:
+            _write_index(stream, partitions, crossing_edges, [
+                _build_partition_file_path(output_file_path, n, link_extension)
+                for n in range(len(partitions))])
+        file_paths.append(output_file_path)
+
+    if render_format and not render_files(file_paths, render_format, jobs):
+        return 1
+
+    return 0
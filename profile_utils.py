@@ -0,0 +1,282 @@
+#!/usr/bin/python
+import __builtin__
+import cProfile
+import json
+import re
+import sys
+import time
+from collections import OrderedDict
+import clang.cindex
+import html_utils
+from parser import name_resolver
+from parser.class_name_scanner import ClassNameScanner
+from parser.class_parser import ClassParser
+from parser.cindex_wrappers import translation_unit_registry
+from parser.cindex_wrappers.class_node_parser import ClassNodeParser
+from parser.cindex_wrappers.file_declarations_parser import FileDeclarationsParser
+from parser.cindex_wrappers.source_range_wrapper import SourceRangeWrapper
+from parser.declaration_parsers.function_declaration_parser import FunctionDeclarationParser
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Functions of module which builds class diagram and their stages. Generators are timed on every
+# item they yield
+_graph_module_stages = [("parse_classes", "class_parsing", True),
+                        ("format_uml_class_features_to_html", "html_rendering", False),
+                        ("write_graph", "build_graph", False)]
+
+# Classes and modules functions and their stages
+_function_stages = [(FileDeclarationsParser, "_index_class_nodes", "class_traversal"),
+                    (ClassNodeParser, "parse", "class_traversal"),
+                    (SourceRangeWrapper, "read", "source_read"),
+                    (ClassParser, "extend_class_with_declaration_info", "declaration_parsing"),
+                    (html_utils, "build_uml_property_representation", "uml_rendering"),
+                    (html_utils, "build_uml_method_representation", "uml_rendering")]
+
+_regex_functions = ["search", "match", "findall", "finditer", "sub", "split"]
+
+# Compiled patterns of repository classes and modules, they are used only by their own methods
+_pattern_attributes = [(FunctionDeclarationParser, "_token_pattern"),
+                       (FunctionDeclarationParser, "_identifier_pattern"),
+                       (ClassNameScanner, "_ignored_pattern"),
+                       (ClassNameScanner, "_token_pattern"),
+                       (translation_unit_registry, "_include_directive_pattern")]
+
+# Repository modules which compile patterns while classes are parsed and use them only themselves
+_pattern_compiling_modules = [name_resolver]
+
+
+# Counts every evaluation of compiled pattern. It isn't compiled pattern itself, so it is given
+# only to repository code which calls its methods
+class _CountingPattern:
+    def __init__(self, pattern, profiler):
+        self.pattern = pattern
+        self.profiler = profiler
+
+    def __getattr__(self, name):
+        value = getattr(self.pattern, name)
+        if name not in _regex_functions:
+            return value
+
+        def count(*args, **kwargs):
+            self.profiler.counters["regex_evaluations"] += 1
+            return value(*args, **kwargs)
+
+        return count
+
+
+# Module re whose compile() returns _CountingPattern, it replaces re only in modules of
+# _pattern_compiling_modules, so other code gets real compiled patterns
+class _CountingRegexModule:
+    def __init__(self, module, profiler):
+        self.module = module
+        self.profiler = profiler
+
+    def compile(self, *args, **kwargs):
+        return _CountingPattern(self.module.compile(*args, **kwargs), self.profiler)
+
+    def __getattr__(self, name):
+        return getattr(self.module, name)
+
+
+# Measures wall and CPU time of stages, parse time of every file and counts of file opens,
+# visited cursors and regex evaluations. Stages are measured by wrapping functions, which is done
+# only by start(), so nothing is measured and nothing costs if profiler isn't started.
+# Time of stage doesn't include time of stages called from it.
+class Profiler:
+    def __init__(self, cprofile_path=None):
+        self.cprofile_path = cprofile_path
+        self.cprofile = None
+
+        self.stages = OrderedDict()
+        self.file_parse_times = OrderedDict()
+        self.counters = OrderedDict([("file_opens", 0), ("clang_files", 0),
+                                     ("cursors_visited", 0), ("regex_evaluations", 0)])
+
+        # every frame is list of stage, wall and CPU start time, wall and CPU time of nested stages
+        self.stack = []
+        self.patches = []
+        self.start_time = None
+        self.start_cpu_time = None
+        self.wall_time = None
+        self.cpu_time = None
+
+    def _enter(self, stage):
+        if any(frame[0] == stage for frame in self.stack):
+            return False
+
+        self.stack.append([stage, time.time(), time.clock(), 0.0, 0.0])
+        return True
+
+    def _exit(self):
+        stage, wall_start, cpu_start, nested_wall, nested_cpu = self.stack.pop()
+        wall = time.time() - wall_start
+        cpu = time.clock() - cpu_start
+
+        record = self.stages.get(stage)
+        if record is None:
+            record = OrderedDict([("calls", 0), ("wall_time", 0.0), ("cpu_time", 0.0)])
+            self.stages[stage] = record
+
+        record["calls"] += 1
+        record["wall_time"] += wall - nested_wall
+        record["cpu_time"] += cpu - nested_cpu
+
+        if self.stack:
+            self.stack[-1][3] += wall
+            self.stack[-1][4] += cpu
+
+        return wall
+
+    def _measure(self, stage, function, args, kwargs):
+        if not self._enter(stage):
+            return function(*args, **kwargs)
+
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self._exit()
+
+    def _wrap_function(self, stage, function):
+        def wrapper(*args, **kwargs):
+            return self._measure(stage, function, args, kwargs)
+
+        return wrapper
+
+    def _wrap_generator(self, stage, function):
+        def wrapper(*args, **kwargs):
+            items = iter(function(*args, **kwargs))
+            while True:
+                yield self._measure(stage, next, [items], {})
+
+        return wrapper
+
+    def _wrap_parse_file_nodes(self, function):
+        def wrapper(file_parser):
+            if file_parser.cached_file_nodes is not None:
+                return function(file_parser)
+
+            self._enter("parse_file_nodes")
+            try:
+                return function(file_parser)
+            finally:
+                wall = self._exit()
+                file_path = file_parser.file_path
+                self.file_parse_times[file_path] = self.file_parse_times.get(file_path, 0) + wall
+                if file_parser.translation_unit is not None:
+                    self.counters["clang_files"] += 1 + len(list(
+                        file_parser.translation_unit.get_includes()))
+
+        return wrapper
+
+    def _wrap_counter(self, counter, function):
+        def wrapper(*args, **kwargs):
+            self.counters[counter] += 1
+            return function(*args, **kwargs)
+
+        return wrapper
+
+    def _wrap_get_children(self, function):
+        def wrapper(cursor):
+            for child in function(cursor):
+                self.counters["cursors_visited"] += 1
+                yield child
+
+        return wrapper
+
+    # Replaces owner attribute by wrapped one, static methods are kept static
+    def _patch(self, owner, name, wrap):
+        original = vars(owner)[name]
+        if isinstance(original, staticmethod):
+            patched = staticmethod(wrap(original.__func__))
+        else:
+            patched = wrap(original)
+
+        self.patches.append((owner, name, original))
+        setattr(owner, name, patched)
+
+    def _install(self, graph_module):
+        self._patch(FileDeclarationsParser, "_parse_file_nodes", self._wrap_parse_file_nodes)
+
+        for owner, name, stage in _function_stages:
+            self._patch(owner, name, lambda function, stage=stage: self._wrap_function(
+                stage, function))
+
+        for name, stage, is_generator in _graph_module_stages:
+            wrap = self._wrap_generator if is_generator else self._wrap_function
+            self._patch(graph_module, name, lambda function, stage=stage, wrap=wrap: wrap(
+                stage, function))
+
+        self._patch(__builtin__, "open", lambda function: self._wrap_counter("file_opens",
+                                                                              function))
+        self._patch(clang.cindex.Cursor, "get_children", self._wrap_get_children)
+
+        for name in _regex_functions:
+            self._patch(re, name, lambda function: self._wrap_counter("regex_evaluations",
+                                                                       function))
+        for owner, name in _pattern_attributes:
+            self._patch(owner, name, lambda pattern: _CountingPattern(pattern, self))
+        for module in _pattern_compiling_modules:
+            self._patch(module, "re", lambda module: _CountingRegexModule(module, self))
+
+    def _uninstall(self):
+        for owner, name, original in reversed(self.patches):
+            setattr(owner, name, original)
+
+        self.patches = []
+
+    # graph_module is module whose functions build class diagram, their stages are measured
+    def start(self, graph_module):
+        self._install(graph_module)
+
+        if self.cprofile_path:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+        self.start_time = time.time()
+        self.start_cpu_time = time.clock()
+
+    def stop(self):
+        self.wall_time = time.time() - self.start_time
+        self.cpu_time = time.clock() - self.start_cpu_time
+
+        if self.cprofile:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.cprofile_path)
+            self.cprofile = None
+
+        self._uninstall()
+
+    # Returns peak resident set size of process and its finished children in kilobytes
+    @staticmethod
+    def _get_peak_rss():
+        if resource is None:
+            return None
+
+        results = [resource.getrusage(who).ru_maxrss
+                   for who in [resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN]]
+        # macOS reports bytes
+        if sys.platform == "darwin":
+            results = [result / 1024 for result in results]
+
+        return max(results)
+
+    def build_report(self):
+        return OrderedDict([("wall_time", self.wall_time),
+                            ("cpu_time", self.cpu_time),
+                            ("stages", self.stages),
+                            ("file_parse_times", self.file_parse_times),
+                            ("counters", self.counters),
+                            ("peak_rss_kb", Profiler._get_peak_rss())])
+
+    # Report is written as JSON to file or to stderr if file path is "-"
+    def write_report(self, file_path):
+        report = json.dumps(self.build_report(), indent=4)
+        if file_path == "-":
+            sys.stderr.write(report + "\n")
+        else:
+            with open(file_path, "w") as f:
+                f.write(report + "\n")
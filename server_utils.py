@@ -0,0 +1,336 @@
+#!/usr/bin/python
+import errno
+import json
+import os
+import socket
+import SocketServer
+import stat
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from StringIO import StringIO
+from arguments_parser import ArgumentsParser
+from parser.cindex_wrappers.source_range_wrapper import SourceBuffers
+from parser.cindex_wrappers.translation_unit_registry import TranslationUnitRegistry
+from parser.lru_dictionary import LruDictionary
+from parser.models import Qualifiers, Relationship
+
+
+# Standard output which is written to stream of current thread if it is set, so messages printed
+# while request is handled are returned to its client, even if other requests are handled
+# concurrently
+class _ThreadOutput:
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def _get_stream(self):
+        return getattr(self.local, "stream", None) or self.stream
+
+    def write(self, data):
+        self._get_stream().write(data)
+
+    def flush(self):
+        self._get_stream().flush()
+
+
+_thread_output_lock = threading.Lock()
+
+
+# Yields stream of messages printed by current thread till exit
+@contextmanager
+def _capture_thread_output():
+    with _thread_output_lock:
+        if not isinstance(sys.stdout, _ThreadOutput):
+            sys.stdout = _ThreadOutput(sys.stdout)
+        output = sys.stdout
+
+    output.local.stream = StringIO()
+    try:
+        yield output.local.stream
+    finally:
+        output.local.stream = None
+
+
+def _get_modification_time(file_path):
+    try:
+        return os.stat(file_path).st_mtime
+    except OSError:
+        return None
+
+
+def _to_json_value(value):
+    if isinstance(value, Relationship):
+        return OrderedDict(zip(value._fields, value))
+    elif isinstance(value, (list, tuple)):
+        return [_to_json_value(item) for item in value]
+    elif hasattr(value, "__slots__"):
+        result = OrderedDict()
+        for name in value.__slots__:
+            field_value = getattr(value, name)
+            if name == "qualifiers":
+                field_value = Qualifiers.to_names(field_value)
+
+            result[name] = _to_json_value(field_value)
+
+        return result
+
+    return value
+
+
+# Keeps translation units and parsed classes between requests. parse(args, args_list, registry,
+# memo) returns classes and render(stream, args, args_list, classes) writes their graph.
+# Parsing is serialized: classes are parsed by one request at a time, since translation units,
+# memos and libclang index are shared, while requests are read and graphs are rendered
+# concurrently. Translation units which include changed files
+# are forgotten together with classes parsed from them. Least recently used translation units
+# are disposed when memory used by them exceeds memory_budget bytes. Files are parsed with
+# precompiled_header if it is given.
+class ClassDiagramService:
+    max_memo_size = 4096
+
+    def __init__(self, parse, render, cache=None, memory_budget=1024 * 1024 * 1024,
+                 precompiled_header=None):
+        self.parse = parse
+        self.render = render
+        self.cache = cache
+        self.memory_budget = memory_budget
+
+        # serializes parsing of all requests, see handle
+        self.lock = threading.Lock()
+        self.registry = TranslationUnitRegistry(precompiled_header)
+        # memo of every extraction, detail, skip_includes and with_relationships, see
+        # parse_selected_classes
+        self.memos = {}
+        # files which classes of every memo key are parsed from and their modification times
+        self.memo_files = {}
+        self.file_times = {}
+
+    def _forget_changed_files(self):
+        changed_files = set(file_path for file_path, modification_time in self.file_times.items()
+                            if _get_modification_time(file_path) != modification_time)
+        if not changed_files:
+            return
+
+        for key in self.registry.translation_units.keys():
+            if changed_files.intersection(self.registry.get_files(key)):
+                self.registry.forget(key)
+
+        for memo in self.memos.itervalues():
+            for key in memo.keys():
+                if changed_files.intersection(self.memo_files.get(key, [])):
+                    del memo[key]
+
+        for file_path in changed_files:
+            SourceBuffers.forget(file_path)
+            del self.file_times[file_path]
+
+    # Classes loaded from cache have no translation unit, so their dependencies are unknown and
+    # they are not kept. Cache checks dependencies itself
+    def _remember_memo_files(self):
+        files = {}
+        for key in self.registry.translation_units.keys():
+            files.setdefault(key[0], set()).update(self.registry.get_files(key))
+
+        memo_files = {}
+        for memo in self.memos.itervalues():
+            for key in memo.keys():
+                if key in self.memo_files:
+                    memo_files[key] = self.memo_files[key]
+                elif key[0][0] in files:
+                    memo_files[key] = files[key[0][0]]
+                else:
+                    del memo[key]
+
+        self.memo_files = memo_files
+        watched_files = set()
+        for key_files in memo_files.values() + files.values():
+            watched_files.update(key_files)
+
+        # files which were already watched keep their modification times, so changes made
+        # during parsing are noticed
+        file_times = {}
+        for file_path in watched_files:
+            if file_path in self.file_times:
+                file_times[file_path] = self.file_times[file_path]
+            else:
+                file_times[file_path] = _get_modification_time(file_path)
+
+        self.file_times = file_times
+
+    def _dispose_translation_units(self):
+        translation_units = self.registry.translation_units
+        memory_usage = OrderedDict((key, self.registry.get_memory_usage(key))
+                                   for key in translation_units)
+        total_memory_usage = sum(memory_usage.values())
+        for key, key_memory_usage in memory_usage.iteritems():
+            if total_memory_usage <= self.memory_budget:
+                break
+
+            self.registry.forget(key)
+            total_memory_usage -= key_memory_usage
+
+    def _parse_classes(self, args, args_list):
+        memo_key = (ArgumentsParser.get_extraction(args), ArgumentsParser.get_detail(args),
+                    args.no_includes, args.ast_relationships)
+        memo = self.memos.get(memo_key)
+        if memo is None:
+            memo = LruDictionary(ClassDiagramService.max_memo_size)
+            self.memos[memo_key] = memo
+
+        self._forget_changed_files()
+        if self.cache:
+            self.cache.forget_file_hashes()
+
+        try:
+            return self.parse(args, args_list, self.registry, memo)
+        finally:
+            self._remember_memo_files()
+            self._dispose_translation_units()
+
+    # Request is dictionary with "arguments" list, which are the same as arguments of
+    # ArgumentsParser, and optional "format", which is either "dot" (default) or "classes".
+    # Response has "status", "messages" printed while request was handled and "result", which
+    # is DOT graph or list of parsed classes
+    def handle(self, request):
+        response = OrderedDict([("status", "error"), ("messages", [])])
+        output_format = request.get("format", "dot")
+        if output_format not in ["dot", "classes"]:
+            response["messages"].append("Error: Unknown format '{}'".format(output_format))
+            return response
+
+        with _capture_thread_output() as messages:
+            # requests wait for each other while classes are parsed, but not while rendered
+            with self.lock:
+                args, args_list = self._parse_arguments(request.get("arguments", []))
+                classes = None
+                try:
+                    if args_list and not self._find_missing_files(args_list):
+                        classes = self._parse_classes(args, args_list)
+                        if not classes:
+                            print "Error: No classes are parsed"
+                            classes = None
+                except ValueError as error:
+                    print(error)
+
+            if classes is not None:
+                try:
+                    if output_format == "dot":
+                        stream = StringIO()
+                        self.render(stream, args, args_list, classes)
+                        response["result"] = stream.getvalue()
+                    else:
+                        response["result"] = _to_json_value(classes)
+
+                    response["status"] = "ok"
+                except ValueError as error:
+                    print(error)
+
+            response["messages"] = messages.getvalue().splitlines()
+
+        return response
+
+    # Returns files which are requested but do not exist, they are reported
+    @staticmethod
+    def _find_missing_files(args_list):
+        results = [args.file_path for args in args_list
+                   if args.file_path and not os.path.isfile(args.file_path)]
+        for file_path in results:
+            print "Error: No such file: '{}'".format(file_path)
+
+        return results
+
+    # Returns arguments and list of arguments of every line of their ARGUMENT_LIST_FILE
+    @staticmethod
+    def _parse_arguments(arguments):
+        try:
+            args = ArgumentsParser.parse([str(argument) for argument in arguments])
+        except SystemExit:
+            args = None
+
+        if not args:
+            print "Error: Could not parse arguments {}".format(arguments)
+            return None, None
+
+        args_list = ArgumentsParser.parse_arguments_file(args.argument_list_file)
+        if not args_list:
+            args_list = [args]
+
+        return args, args_list
+
+
+# Every line of connection is JSON request, response is written as one line too.
+# See ClassDiagramService.handle
+class _RequestHandler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        for line in iter(self.rfile.readline, ""):
+            if not line.strip():
+                continue
+
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("request is not JSON object")
+            except ValueError as error:
+                response = {"status": "error",
+                            "messages": ["Error: Invalid request: {}".format(error)]}
+            else:
+                response = self.server.service.handle(request)
+
+            self.wfile.write(json.dumps(response) + "\n")
+            self.wfile.flush()
+
+
+class _Server(SocketServer.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, service):
+        self.service = service
+        SocketServer.ThreadingUnixStreamServer.__init__(self, socket_path, _RequestHandler)
+
+
+def _is_socket_listened(socket_path):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+        return True
+    except socket.error:
+        return False
+    finally:
+        client.close()
+
+
+# Socket file left by server which wasn't stopped properly is removed. Returns False if other
+# server is listening on socket, then it is kept
+def _remove_stale_socket(socket_path):
+    try:
+        if stat.S_ISSOCK(os.stat(socket_path).st_mode):
+            if _is_socket_listened(socket_path):
+                return False
+
+            os.remove(socket_path)
+    except OSError as error:
+        if error.errno != errno.ENOENT:
+            raise
+
+    return True
+
+
+# Serves requests of service on Unix socket till interrupted. Returns exit code, which is 1 if
+# other server is already listening on socket
+def serve(socket_path, service):
+    if not _remove_stale_socket(socket_path):
+        print "Error: Server is already listening on '{}'".format(socket_path)
+        return 1
+
+    server = _Server(socket_path, service)
+    print "Listening on '{}'".format(socket_path)
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        _remove_stale_socket(socket_path)
+
+    return 0
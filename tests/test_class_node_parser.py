@@ -0,0 +1,71 @@
+#!/usr/bin/python
+import os
+import shutil
+import tempfile
+import unittest
+from parser.cindex_wrappers.class_node_parser import ClassNodeParser
+from parser.cindex_wrappers.file_declarations_parser import FileDeclarationsParser
+
+
+class SplitParametersDeclarationsTest(unittest.TestCase):
+    def _split(self, declaration, name):
+        return ClassNodeParser._split_parameters_declarations(declaration, name)
+
+    def test_comma_in_string_default(self):
+        self.assertEqual(self._split('void f(int a, const std::string& b = "x,y")', "f"),
+                         ["int a", 'const std::string& b = "x,y"'])
+
+    def test_comma_and_bracket_in_char_default(self):
+        self.assertEqual(self._split("void f(char a = ',', char b = ')', int c)", "f"),
+                         ["char a = ','", "char b = ')'", "int c"])
+
+    def test_arrow_default(self):
+        self.assertEqual(self._split("int f(int n = static_cast<Box*>(0)->value, int m)", "f"),
+                         ["int n = static_cast<Box*>(0)->value", "int m"])
+
+    def test_comparison_default(self):
+        self.assertEqual(self._split("int f(bool a = (1 > 0), bool b = 1 < 2, int c)", "f"),
+                         ["bool a = (1 > 0)", "bool b = 1 < 2", "int c"])
+
+    def test_template_arguments(self):
+        self.assertEqual(self._split("void f(std::map<int, Box<int>> a, int b)", "f"),
+                         ["std::map<int, Box<int>> a", "int b"])
+
+
+class MethodParametersTest(unittest.TestCase):
+    _header = ('#include "missing.h"\n'
+               'struct S {\n'
+               '    void (*callback(int a, const char* b = "x,y"))(int);\n'
+               '    void take(Missing a, const char* b = "x,y");\n'
+               '};\n')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, "s.h")
+        with open(self.file_path, "w") as f:
+            f.write(MethodParametersTest._header)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _parse_parameters(self, skip_includes):
+        file_parser = FileDeclarationsParser(self.file_path, ["-xc++"],
+                                             skip_includes=skip_includes)
+        _class = file_parser.parse_classes("S")[0]
+        return dict((method.name, [parameter.declaration for parameter in method.parameters])
+                    for method in _class.methods)
+
+    # Valid declarations are parsed from parameters nodes, without includes too, even if there
+    # are more nodes than parameters
+    def test_valid_declaration_is_not_split(self):
+        self.assertEqual(self._parse_parameters(True)["callback"],
+                         self._parse_parameters(False)["callback"])
+        self.assertNotIn('y"', self._parse_parameters(True)["callback"])
+
+    def test_invalid_declaration_is_split_without_includes(self):
+        self.assertEqual(self._parse_parameters(True)["take"],
+                         ["Missing a", 'const char* b = "x,y"'])
+
+
+if __name__ == "__main__":
+    unittest.main()
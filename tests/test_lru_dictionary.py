@@ -0,0 +1,32 @@
+#!/usr/bin/python
+import unittest
+from parser.lru_dictionary import LruDictionary
+
+
+class LruDictionaryTest(unittest.TestCase):
+    def _build(self):
+        result = LruDictionary(3)
+        for key in ["a", "b", "c"]:
+            result[key] = key.upper()
+
+        return result
+
+    def test_get_makes_item_most_recently_used(self):
+        dictionary = self._build()
+        self.assertEqual(dictionary.get("a"), "A")
+        dictionary["d"] = "D"
+        self.assertEqual(dictionary.keys(), ["c", "a", "d"])
+        self.assertEqual(dictionary.get("b", "missing"), "missing")
+
+    def test_iteration_keeps_order(self):
+        dictionary = self._build()
+        self.assertEqual(dictionary.items(), [("a", "A"), ("b", "B"), ("c", "C")])
+        self.assertEqual(dictionary.values(), ["A", "B", "C"])
+        self.assertEqual(dictionary.copy().keys(), ["a", "b", "c"])
+        self.assertEqual(repr(dictionary), "LruDictionary([('a', 'A'), ('b', 'B'), ('c', 'C')])")
+        self.assertEqual(dictionary["b"], "B")
+        self.assertEqual(dictionary.keys(), ["a", "b", "c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
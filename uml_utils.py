@@ -1,17 +1,20 @@
 #!/usr/bin/python
+from parser.models import Qualifiers
 
 _uml_specifier_representations = {"PRIVATE": "-", "PROTECTED": "#", "PUBLIC": "+"}
 
 
-def build_uml_properties_representation(properties):
-    results = []
-    for property in properties:
-        specifier = property["access_specifier"]
-        specifier_representation = _uml_specifier_representations[specifier]
-        result = "{} {} : {}".format(specifier_representation, property["name"], property["type"])
-        results.append(result)
+# Property without type is parsed with names only, see Detail
+def build_uml_property_representation(property):
+    specifier_representation = _uml_specifier_representations[property.access_specifier]
+    if property.type is None:
+        return "{} {}".format(specifier_representation, property.name)
+
+    return "{} {} : {}".format(specifier_representation, property.name, property.type)
 
-    return results
+
+def build_uml_properties_representation(properties):
+    return [build_uml_property_representation(property) for property in properties]
 
 
 def _build_uml_method_parameters_representation(method):
@@ -19,46 +22,47 @@ def _build_uml_method_parameters_representation(method):
 
     representation = "{} : {}"
 
-    for parameter in method["parameters"]:
+    for parameter in method.parameters:
         results.append(
-            representation.format(parameter["name"], parameter["type"]))
+            representation.format(parameter.name, parameter.type))
 
     return ', '.join(results)
 
 
 def _build_uml_method_return_type_representation(method):
-    if "constructor" in method["qualifiers"] or "destructor" in method["qualifiers"]:
+    if method.qualifiers & (Qualifiers.CONSTRUCTOR | Qualifiers.DESTRUCTOR):
         return ""
 
-    return method["type"]
+    return method.type
 
 
 def _build_uml_method_specificators_representation(method):
-    if "pure" in method["qualifiers"] or "virtual" in method["qualifiers"]:
+    if method.qualifiers & (Qualifiers.PURE | Qualifiers.VIRTUAL):
         return "= 0"
-    elif "virtual" in method["qualifiers"]:
+    elif method.qualifiers & Qualifiers.VIRTUAL:
         return "[virtual]"
-    elif "override" in method["qualifiers"]:
+    elif method.qualifiers & Qualifiers.OVERRIDE:
         return "[override]"
     else:
         return ""
 
 
-def build_uml_methods_representation(methods):
-    results = []
-
+# Method without type is parsed with names only, see Detail
+def build_uml_method_representation(method):
     representation = "{} {}( {} ) : {} {}"
 
-    for method in methods:
-        specifier = method["access_specifier"]
-        specifier_representation = _uml_specifier_representations[specifier]
-        result = representation.format(specifier_representation,
-                                       method["name"],
-                                       _build_uml_method_parameters_representation(method),
-                                       _build_uml_method_return_type_representation(method),
-                                       _build_uml_method_specificators_representation(method))
+    specifier_representation = _uml_specifier_representations[method.access_specifier]
+    if method.type is None:
+        return "{} {}()".format(specifier_representation, method.name)
+
+    result = representation.format(specifier_representation,
+                                   method.name,
+                                   _build_uml_method_parameters_representation(method),
+                                   _build_uml_method_return_type_representation(method),
+                                   _build_uml_method_specificators_representation(method))
 
-        result = result.rstrip(": ")
-        results.append(result)
+    return result.rstrip(": ")
 
-    return results
+
+def build_uml_methods_representation(methods):
+    return [build_uml_method_representation(method) for method in methods]
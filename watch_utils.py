@@ -0,0 +1,132 @@
+#!/usr/bin/python
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from parser.cindex_wrappers.source_range_wrapper import SourceBuffers
+
+
+# File appears at file_path only when everything is written
+@contextmanager
+def open_file_atomically(file_path):
+    directory = os.path.dirname(os.path.abspath(file_path))
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "w") as f:
+            yield f
+
+        os.rename(temp_path, file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _get_modification_time(file_path):
+    try:
+        return os.stat(file_path).st_mtime
+    except OSError:
+        return None
+
+
+# Returns dictionary of every memo key to files which its classes are parsed from. Classes loaded
+# from cache have no translation unit, so their files are taken from cache dependencies and
+# files of precompiled headers
+def _get_memo_files(registry, memo, cache):
+    files = {}
+    for key in registry.translation_units.keys():
+        files.setdefault(key[0], set()).update(registry.get_files(key))
+
+    results = {}
+    for key in memo.keys():
+        file_path, clang_args = key[0][0], key[0][1]
+        if file_path in files:
+            results[key] = files[file_path]
+            continue
+
+        dependencies = cache.get_dependencies(file_path, clang_args) if cache else None
+        if dependencies is None:
+            continue
+
+        results[key] = set(dependencies)
+        precompiled_header = registry.precompiled_header
+        if precompiled_header is not None:
+            for precompiled_header_args in precompiled_header.manifests.keys():
+                results[key].update(precompiled_header.get_files(precompiled_header_args))
+
+    return results
+
+
+# Returns dictionary of every file of every translation unit and of every memo key to its
+# modification time
+def _get_watched_files(registry, memo_files):
+    results = {}
+    for key in registry.translation_units.keys():
+        for file_path in registry.get_files(key):
+            if file_path not in results:
+                results[file_path] = _get_modification_time(file_path)
+
+    for key_files in memo_files.itervalues():
+        for file_path in key_files:
+            if file_path not in results:
+                results[file_path] = _get_modification_time(file_path)
+
+    return results
+
+
+def _get_changed_files(watched_files):
+    return [file_path for file_path, modification_time in watched_files.iteritems()
+            if _get_modification_time(file_path) != modification_time]
+
+
+# Returns files modified since start_time, which could be modified after they were parsed
+def _get_files_modified_since(watched_files, start_time):
+    return [file_path for file_path, modification_time in watched_files.iteritems()
+            if modification_time is not None and modification_time >= start_time]
+
+
+# Reparses translation units which include changed files and forgets classes parsed from them,
+# memo_files are files of every memo key, see _get_memo_files
+def _update(registry, memo, cache, changed_files, memo_files):
+    changed_files = set(changed_files)
+    affected_files = set()
+    for key in registry.translation_units.keys():
+        if changed_files.intersection(registry.get_files(key)):
+            registry.reparse(key)
+            affected_files.add(key[0])
+
+    for key in memo.keys():
+        if key[0][0] in affected_files or changed_files.intersection(memo_files.get(key, [])):
+            del memo[key]
+
+    for file_path in changed_files:
+        SourceBuffers.forget(file_path)
+
+    if cache:
+        cache.forget_file_hashes()
+
+
+# Calls build(stream, registry, memo), which writes graph to stream, and stores graph to
+# output_file_path every time any file of parsed translation units is changed. Translation
+# units are kept between builds, so only translation units of changed files are reparsed and
+# only their classes are parsed again. Files saved during update or build are updated at once
+def watch(build, output_file_path, registry, memo, cache=None, interval=0.2):
+    start_time = time.time()
+    while True:
+        try:
+            with open_file_atomically(output_file_path) as stream:
+                build(stream, registry, memo)
+                stream.write("\n")
+
+            print "Updated '{}'".format(output_file_path)
+        except ValueError as error:
+            print(error)
+
+        memo_files = _get_memo_files(registry, memo, cache)
+        watched_files = _get_watched_files(registry, memo_files)
+        changed_files = _get_files_modified_since(watched_files, start_time)
+        while not changed_files:
+            time.sleep(interval)
+            changed_files = _get_changed_files(watched_files)
+
+        start_time = time.time()
+        _update(registry, memo, cache, changed_files, memo_files)